@@ -0,0 +1,128 @@
+import numpy as np
+
+from main import NUM_TILE_TYPES
+from scoring import score_hands
+from shanten import TERMINAL_HONOR_IDS, is_agari
+from simulation import empty_results, merge_results
+
+WALL_SIZE = NUM_TILE_TYPES * 4
+DEAD_WALL_SIZE = 16
+HAND_SIZE = 13
+
+def default_discards(hands):
+    return np.argmax(hands > 0, axis=1)
+
+def aggressive_discards(hands):
+    return np.argmin(np.where(hands > 0, hands, 5), axis=1)
+
+def defensive_discards(hands):
+    safe = (hands > 0) & (hands < 3)
+    return np.where(safe.any(axis=1), np.argmax(safe, axis=1), np.argmax(hands > 0, axis=1))
+
+STRATEGIES = {
+    'default': default_discards,
+    'advanced_ai': default_discards,
+    'aggressive': aggressive_discards,
+    'defensive': defensive_discards,
+}
+
+class BatchedMahjong:
+    def __init__(self, n_games, seed=None, strategies=('default', 'aggressive', 'defensive', 'default')):
+        self.n_games = n_games
+        self.rng = np.random.default_rng(seed)
+        self.strategies = [STRATEGIES[name] for name in strategies]
+        base = np.repeat(np.arange(NUM_TILE_TYPES, dtype=np.int8), 4)
+        self.walls = self.rng.permuted(np.tile(base, (n_games, 1)), axis=1)
+        self.hands = np.zeros((n_games, 4, NUM_TILE_TYPES), dtype=np.int8)
+        self.discards = np.zeros((n_games, NUM_TILE_TYPES), dtype=np.int8)
+        self.cursors = np.zeros(n_games, dtype=np.int16)
+        self.finished = np.zeros(n_games, dtype=bool)
+        self.winners = np.full(n_games, -1, dtype=np.int8)
+        self.winning_shapes = np.zeros(n_games, dtype=np.int8)
+        self.current_player = 0
+        self.turns = 0
+        self.deal_hands()
+
+    def deal_hands(self):
+        rows = np.arange(self.n_games)[:, None]
+        for seat in range(4):
+            tiles = self.walls[:, seat * HAND_SIZE:(seat + 1) * HAND_SIZE]
+            np.add.at(self.hands, (rows, seat, tiles), 1)
+        self.cursors[:] = 4 * HAND_SIZE
+
+    def check_for_wins(self, rows, seat):
+        hands = self.hands[rows, seat]
+        honors = hands[:, 27:]
+        suit_remainders = hands[:, :27].reshape(-1, 3, 9).sum(axis=2) % 3
+        pair_groups = (suit_remainders == 2).sum(axis=1) + (honors == 2).sum(axis=1)
+        standard = (~((honors == 1) | (honors == 4)).any(axis=1)
+                    & (suit_remainders != 1).all(axis=1) & (pair_groups == 1))
+        seven_pairs = (hands == 2).sum(axis=1) == 7
+        orphans = (hands[:, TERMINAL_HONOR_IDS] > 0).all(axis=1) & (hands[:, TERMINAL_HONOR_IDS].sum(axis=1) == 14)
+        wins = seven_pairs | orphans
+        for index in np.nonzero(standard & ~wins)[0]:
+            wins[index] = is_agari(hands[index].tolist())
+        shapes = np.where(orphans, 2, np.where(seven_pairs, 1, 0))
+        return wins, shapes
+
+    def step(self):
+        seat = self.current_player
+        rows = np.nonzero(~self.finished)[0]
+        if rows.size == 0:
+            return False
+        exhausted = self.cursors[rows] >= WALL_SIZE - DEAD_WALL_SIZE
+        self.finished[rows[exhausted]] = True
+        rows = rows[~exhausted]
+        if rows.size:
+            tiles = self.walls[rows, self.cursors[rows]]
+            self.cursors[rows] += 1
+            self.hands[rows, seat, tiles] += 1
+            wins, shapes = self.check_for_wins(rows, seat)
+            winners = rows[wins]
+            self.finished[winners] = True
+            self.winners[winners] = seat
+            self.winning_shapes[winners] = shapes[wins]
+            rows = rows[~wins]
+            discards = self.strategies[seat](self.hands[rows, seat])
+            self.hands[rows, seat, discards] -= 1
+            self.discards[rows, discards] += 1
+        self.current_player = (seat + 1) % 4
+        self.turns += 1
+        return True
+
+    def play(self):
+        while self.step():
+            pass
+        return self.results()
+
+    def results(self):
+        results = empty_results()
+        drawn = self.cursors - 4 * HAND_SIZE
+        results["games"] = self.n_games
+        results["rounds"] = self.n_games
+        results["num_draws"] = int((self.winners < 0).sum())
+        results["round_wins"] = np.bincount(self.winners[self.winners >= 0], minlength=4).tolist()
+        rows = np.nonzero(self.winners >= 0)[0]
+        winners = self.winners[rows]
+        scores = score_hands((hand, (), (), 0, ()) for hand in self.hands[rows, winners].tolist())
+        points = np.array([score.points for score in scores], dtype=np.int64)
+        results["points"] = np.bincount(winners, weights=points, minlength=4).astype(np.int64).tolist()
+        results["game_statistics"]["turns"] = int(drawn.sum())
+        results["game_statistics"]["draws"] = int(drawn.sum()) + 4 * HAND_SIZE * self.n_games
+        results["game_statistics"]["discards"] = int(self.discards.sum(dtype=np.int64))
+        results["special_hand_counts"]["all_pong"] = sum('all_pongs' in score.patterns for score in scores)
+        results["special_hand_counts"]["pure_triplets"] = sum(
+            'all_pongs' in score.patterns and 'pure_flush' in score.patterns for score in scores)
+        results["special_hand_counts"]["seven_pairs"] = int((self.winning_shapes == 1).sum())
+        results["special_hand_counts"]["thirteen_orphans"] = int((self.winning_shapes == 2).sum())
+        return results
+
+def simulate_batched(n_games, seed=0, strategies=('default', 'aggressive', 'defensive', 'default'), batch_size=100000):
+    rng = np.random.default_rng(seed)
+    total = empty_results()
+    remaining = n_games
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        merge_results(total, BatchedMahjong(size, int(rng.integers(2 ** 63)), strategies).play())
+        remaining -= size
+    return total
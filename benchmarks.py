@@ -0,0 +1,299 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from main import Mahjong, Wall
+from scoring import score_hands
+from shanten import is_agari, shanten
+
+SEED = 1234
+
+# Retained bytes per table, about 20% above what a table measures today.
+# Active tables are measured mid-round and again after dozens of rounds, so
+# state that grows over a session shows up; 100k active tables fit in 0.9 GiB.
+IDLE_TABLE_BUDGET = 5 * 1024
+ACTIVE_TABLE_BUDGET = 9 * 1024
+MEMORY_CASES = (
+    ("idle", 0, 200, IDLE_TABLE_BUDGET),
+    ("active", 60, 200, ACTIVE_TABLE_BUDGET),
+    ("long-running", 2000, 20, ACTIVE_TABLE_BUDGET),
+)
+MEMORY_STRATEGIES = ['default', 'aggressive', 'defensive', 'default']
+
+class Benchmark:
+    def __init__(self, name, run, setup=None, inner=1):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.inner = inner
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(samples):
+    return {
+        "mean": statistics.fmean(samples),
+        "p50": percentile(samples, 0.50),
+        "p90": percentile(samples, 0.90),
+        "p99": percentile(samples, 0.99),
+        "min": min(samples),
+        "samples": len(samples),
+    }
+
+def measure_memory(benchmark):
+    if benchmark.setup is not None:
+        benchmark.setup()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start, _ = tracemalloc.get_traced_memory()
+    benchmark.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return max(0, peak - start)
+
+def time_benchmark(benchmark, samples, warmup=3):
+    timer = time.perf_counter
+    inner = benchmark.inner
+    run = benchmark.run
+    for _ in range(warmup):
+        if benchmark.setup is not None:
+            benchmark.setup()
+        for _ in range(inner):
+            run()
+    timings = []
+    for _ in range(samples):
+        if benchmark.setup is not None:
+            benchmark.setup()
+        start = timer()
+        for _ in range(inner):
+            run()
+        timings.append((timer() - start) / inner)
+    result = summarize(timings)
+    result["unit"] = "seconds/call"
+    result["peak_memory_bytes"] = measure_memory(benchmark)
+    return result
+
+def dealt_game():
+    game = Mahjong(seed=SEED, headless=True)
+    game.deal_hand()
+    game.activate_strategy_mode()
+    for _ in range(8):
+        game.finish_turn(game.play_turn())
+    game.add_tile_to_hand(0, game.draw_from_wall())
+    return game
+
+def micro_benchmarks(save_path):
+    game = dealt_game()
+    hand = game.players[0]
+    counts = game.hand_counts[0]
+    wall_tiles = game.generate_tiles()
+    state = {}
+    finished_hands = [(list(counts[:tile_id]) + [counts[tile_id] + 1] + list(counts[tile_id + 1:]), (), (), 0, ())
+                      for tile_id in range(len(counts))]
+
+    def fresh_wall():
+        game.wall = Wall(list(wall_tiles))
+        game.reset_wall_statistics()
+
+    def drain_wall():
+        for _ in range(100):
+            game.draw_tile()
+
+    def fresh_table():
+        table = Mahjong(seed=SEED, headless=True)
+        state["table"] = table
+
+    def track_all():
+        game.track_tile_frequency()
+        game.track_suit_frequency()
+        game.track_rank_frequency()
+
+    def evaluate_cold():
+        game.discard_evaluator.clear_cache()
+        game.discard_evaluator.evaluate(counts)
+
+    return [
+        Benchmark("generate_tiles", game.generate_tiles, inner=10),
+        Benchmark("draw_tile", drain_wall, setup=fresh_wall),
+        Benchmark("deal_hand", lambda: state["table"].deal_hand(), setup=fresh_table),
+        Benchmark("find_possible_melds", lambda: game.find_possible_melds(hand), inner=1000),
+        Benchmark("find_possible_kongs", lambda: game.find_possible_kongs(hand), inner=1000),
+        Benchmark("find_most_disposable_tile", lambda: game.find_most_disposable_tile(hand), inner=1000),
+        Benchmark("check_thirteen_orphans", lambda: game.check_thirteen_orphans(0), inner=1000),
+        Benchmark("calculate_points", lambda: game.calculate_points(0), inner=1000),
+        Benchmark("score_hands", lambda: score_hands(finished_hands), inner=10),
+        Benchmark("track_frequency", track_all, inner=1000),
+        Benchmark("shanten", lambda: shanten(counts), inner=1000),
+        Benchmark("is_agari", lambda: is_agari(counts), inner=1000),
+        Benchmark("discard_evaluator_cold", evaluate_cold, inner=5),
+        Benchmark("discard_evaluator_warm", lambda: game.discard_evaluator.evaluate(counts), inner=100),
+        Benchmark("snapshot_clone", game.snapshot_state().clone, inner=1000),
+        Benchmark("save_game_state", lambda: game.save_game_state(save_path), inner=10),
+    ]
+
+def strategy_names():
+    return Mahjong(seed=SEED, headless=True).strategy_names()
+
+def macro_benchmark(strategy, games):
+    game_times = []
+    turns = 0
+    peak = 0
+    for index in range(games):
+        game = Mahjong(seed=f"{SEED}:{index}", headless=True)
+        game.max_rounds = 1
+        game.set_strategies([strategy] * 4)
+        track = index == 0
+        if track:
+            tracemalloc.start()
+            start_memory, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        game.play_game()
+        game_times.append(time.perf_counter() - start)
+        if track:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peak = max(0, peak - start_memory)
+        turns += game.game_statistics['turns']
+    elapsed = sum(game_times)
+    result = summarize(game_times)
+    result["unit"] = "seconds/game"
+    result["games_per_sec"] = games / elapsed
+    result["turns_per_sec"] = turns / elapsed
+    result["peak_memory_bytes"] = peak
+    return result
+
+def selected(name, only):
+    return not only or any(pattern in name for pattern in only)
+
+def run_suite(samples, games, only=None):
+    results = {}
+    fd, save_path = tempfile.mkstemp(suffix=".bin")
+    os.close(fd)
+    try:
+        for benchmark in micro_benchmarks(save_path):
+            name = f"micro.{benchmark.name}"
+            if selected(name, only):
+                results[name] = time_benchmark(benchmark, samples)
+    finally:
+        os.remove(save_path)
+    for strategy in strategy_names():
+        name = f"macro.{strategy}"
+        if selected(name, only):
+            results[name] = macro_benchmark(strategy, games)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": SEED,
+            "samples": samples,
+            "games": games,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+def new_table(seed, turns):
+    game = Mahjong(seed=seed, headless=True)
+    game.set_strategies(MEMORY_STRATEGIES)
+    if turns:
+        game.deal_hand()
+        game.activate_strategy_mode()
+        for _ in range(turns):
+            game.finish_turn(game.play_turn())
+    return game
+
+def table_memory(tables, turns):
+    # Count what is freed when the tables go away, so the shared shanten and
+    # evaluator caches warmed while playing are not charged to the tables.
+    gc.collect()
+    tracemalloc.start()
+    kept = [new_table(seed, turns) for seed in range(tables)]
+    gc.collect()
+    with_tables, _ = tracemalloc.get_traced_memory()
+    kept.clear()
+    gc.collect()
+    without_tables, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (with_tables - without_tables) / tables
+
+def check_memory_budget():
+    failures = []
+    for name, turns, tables, budget in MEMORY_CASES:
+        used = table_memory(tables, turns)
+        print(f"{name + ' table':40s} {used / 1024:8.1f}KiB  budget {budget / 1024:8.1f}KiB")
+        if used > budget:
+            failures.append((name, used, budget))
+    return failures
+
+def compare(report, baseline, threshold, only=None):
+    regressions = []
+    missing = []
+    for name, old in baseline["results"].items():
+        new = report["results"].get(name)
+        if new is None:
+            if selected(name, only):
+                missing.append(name)
+            continue
+        if "turns_per_sec" in old:
+            change = old["turns_per_sec"] / new["turns_per_sec"] - 1
+        else:
+            change = new["p50"] / old["p50"] - 1
+        if change > threshold:
+            regressions.append((name, change))
+    return regressions, missing
+
+def print_report(report):
+    for name, result in report["results"].items():
+        line = f"{name:40s} p50 {result['p50'] * 1e6:12.2f}us  p99 {result['p99'] * 1e6:12.2f}us"
+        if "turns_per_sec" in result:
+            line += f"  {result['turns_per_sec']:10.0f} turns/s  {result['games_per_sec']:8.2f} games/s"
+        line += f"  peak {result['peak_memory_bytes'] / 1024:8.1f}KiB"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Mahjong hot paths and full games.")
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--only", nargs="*", help="Run only benchmarks whose name contains one of these strings")
+    parser.add_argument("--save", help="Write the results as a JSON baseline to this path")
+    parser.add_argument("--compare", help="Compare against a JSON baseline and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--memory-budget", action="store_true", help="Run only the per-table memory budget check")
+    args = parser.parse_args()
+    failed = False
+    if not args.memory_budget:
+        report = run_suite(args.samples, args.games, args.only)
+        print_report(report)
+        if args.save:
+            with open(args.save, "w") as f:
+                json.dump(report, f, indent=2)
+        if args.compare:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+            regressions, missing = compare(report, baseline, args.threshold, args.only)
+            for name, change in regressions:
+                print(f"REGRESSION {name}: {change * 100:.1f}% slower than baseline")
+            for name in missing:
+                print(f"MISSING {name}: in the baseline but not in this run")
+            if not set(report["results"]) & set(baseline["results"]):
+                print("NOTHING COMPARED: no benchmark in this run is in the baseline")
+                failed = True
+            failed = failed or bool(regressions or missing)
+    if args.memory_budget or not args.only:
+        for name, used, budget in check_memory_budget():
+            print(f"OVER BUDGET {name} table: {used / 1024:.1f}KiB > {budget / 1024:.1f}KiB")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
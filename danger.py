@@ -0,0 +1,95 @@
+from array import array
+
+from shanten import HONOR_START, NUM_TILE_TYPES
+
+BASE_DANGER = [0] * NUM_TILE_TYPES
+for _tile_id in range(NUM_TILE_TYPES):
+    if _tile_id >= HONOR_START:
+        BASE_DANGER[_tile_id] = 4
+    elif _tile_id % 9 in (0, 8):
+        BASE_DANGER[_tile_id] = 6
+    elif _tile_id % 9 in (1, 7):
+        BASE_DANGER[_tile_id] = 8
+    else:
+        BASE_DANGER[_tile_id] = 10
+
+SUJI_NEIGHBOURS = [[] for _ in range(NUM_TILE_TYPES)]
+for _tile_id in range(HONOR_START):
+    for _offset in (-3, 3):
+        if 0 <= _tile_id % 9 + _offset < 9:
+            SUJI_NEIGHBOURS[_tile_id].append(_tile_id + _offset)
+
+def tile_danger(tile_id, genbutsu, suji, visible):
+    if genbutsu:
+        return 0
+    danger = BASE_DANGER[tile_id]
+    if suji:
+        danger //= 2
+    return danger * max(0, 4 - visible)
+
+class DangerIndex:
+    __slots__ = ('genbutsu', 'suji', 'visible', 'weights', 'danger', 'combined')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.genbutsu = [0] * 4
+        self.suji = [0] * 4
+        self.visible = bytearray(NUM_TILE_TYPES)
+        self.weights = [1] * 4
+        self.danger = array('H', [BASE_DANGER[tile_id] * 4 for tile_id in range(NUM_TILE_TYPES)] * 4)
+        self.combined = array('H', [BASE_DANGER[tile_id] * 12 for tile_id in range(NUM_TILE_TYPES)] * 4)
+
+    def refresh(self, seat, tile_id):
+        bit = 1 << tile_id
+        slot = seat * NUM_TILE_TYPES + tile_id
+        value = tile_danger(tile_id, self.genbutsu[seat] & bit, self.suji[seat] & bit, self.visible[tile_id])
+        delta = (value - self.danger[slot]) * self.weights[seat]
+        self.danger[slot] = value
+        if delta:
+            for other in range(4):
+                if other != seat:
+                    self.combined[other * NUM_TILE_TYPES + tile_id] += delta
+
+    def reveal(self, tile_id, count=1):
+        self.visible[tile_id] += count
+        for seat in range(4):
+            self.refresh(seat, tile_id)
+
+    def discard(self, seat, tile_id):
+        if tile_id >= NUM_TILE_TYPES:
+            return
+        self.genbutsu[seat] |= 1 << tile_id
+        for neighbour in SUJI_NEIGHBOURS[tile_id]:
+            self.suji[seat] |= 1 << neighbour
+            self.refresh(seat, neighbour)
+        self.reveal(tile_id)
+
+    def expose(self, seat, tile_id, count):
+        self.weights[seat] += 1
+        start = seat * NUM_TILE_TYPES
+        for other in range(4):
+            if other != seat:
+                offset = other * NUM_TILE_TYPES
+                for index in range(NUM_TILE_TYPES):
+                    self.combined[offset + index] += self.danger[start + index]
+        self.reveal(tile_id, count)
+
+    def danger_to(self, seat, tile_id):
+        if tile_id >= NUM_TILE_TYPES:
+            return 0
+        return self.combined[seat * NUM_TILE_TYPES + tile_id]
+
+    def safest(self, seat, hand, counts):
+        combined = self.combined
+        offset = seat * NUM_TILE_TYPES
+        best_tile = None
+        best_key = None
+        for tile in hand:
+            tile_id = tile.id
+            key = (combined[offset + tile_id], counts[tile_id]) if tile_id < NUM_TILE_TYPES else (-1, 0)
+            if best_key is None or key < best_key:
+                best_key = key
+                best_tile = tile
+        return best_tile
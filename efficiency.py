@@ -0,0 +1,129 @@
+from functools import lru_cache
+
+from shanten import (HONOR_START, NUM_TILE_TYPES, TERMINAL_HONOR_IDS, combine_groups, pattern_options,
+                     shanten_with_group)
+
+NUM_SUITED_TYPES = 27
+GROUP_STARTS = (0, 9, 18, HONOR_START)
+GROUP_ENDS = (9, 18, 27, NUM_TILE_TYPES)
+
+def candidate_draws(counts, closed):
+    candidates = set()
+    for tile_id in range(NUM_SUITED_TYPES):
+        if counts[tile_id]:
+            suit_start = tile_id - tile_id % 9
+            candidates.update(range(max(suit_start, tile_id - 2), min(suit_start + 9, tile_id + 3)))
+    for tile_id in range(HONOR_START, NUM_TILE_TYPES):
+        if counts[tile_id]:
+            candidates.add(tile_id)
+    if closed:
+        if sum(1 for count in counts if count) < 7:
+            return range(NUM_TILE_TYPES)
+        candidates.update(TERMINAL_HONOR_IDS)
+    return sorted(candidates)
+
+TERMINAL_HONOR_SET = frozenset(TERMINAL_HONOR_IDS)
+
+def tile_group(tile_id):
+    return 3 if tile_id >= HONOR_START else tile_id // 9
+
+TILE_GROUPS = tuple(tile_group(tile_id) for tile_id in range(NUM_TILE_TYPES))
+TILE_OFFSETS = tuple(tile_id - GROUP_STARTS[TILE_GROUPS[tile_id]] for tile_id in range(NUM_TILE_TYPES))
+
+def group_pattern(counts, group):
+    return tuple(counts[GROUP_STARTS[group]:GROUP_ENDS[group]])
+
+def draw_options(pattern, group):
+    counts = list(pattern)
+    options = []
+    for offset, held in enumerate(pattern):
+        if held >= 4:
+            options.append(None)
+            continue
+        counts[offset] += 1
+        options.append(pattern_options(tuple(counts), group))
+        counts[offset] -= 1
+    return tuple(options)
+
+def evaluate_discards(counts, exposed, draw_table=draw_options):
+    counts = list(counts)
+    closed = exposed == 0
+    patterns = [group_pattern(counts, group) for group in range(4)]
+    hand_groups = [pattern_options(patterns[group], group) for group in range(4)]
+    hand_draws = [draw_table(patterns[group], group) for group in range(4)]
+    results = []
+    for discard in range(NUM_TILE_TYPES):
+        if not counts[discard]:
+            continue
+        counts[discard] -= 1
+        discard_group = TILE_GROUPS[discard]
+        pattern = group_pattern(counts, discard_group)
+        groups = hand_groups.copy()
+        groups[discard_group] = pattern_options(pattern, discard_group)
+        draws = hand_draws.copy()
+        draws[discard_group] = draw_table(pattern, discard_group)
+        others = [combine_groups(groups[:group] + groups[group + 1:], exposed) for group in range(4)]
+        current = shanten_with_group(others[0], groups[0])
+        if closed:
+            kinds = NUM_TILE_TYPES - counts.count(0)
+            pairs = kinds - counts.count(1)
+            orphan_kinds = sum(1 for tile_id in TERMINAL_HONOR_IDS if counts[tile_id])
+            orphan_pair = any(counts[tile_id] >= 2 for tile_id in TERMINAL_HONOR_IDS)
+            current = min(current, 6 - pairs + max(0, 7 - kinds), 13 - orphan_kinds - orphan_pair)
+        accepting = []
+        for draw in candidate_draws(counts, closed):
+            held = counts[draw]
+            if held >= 4:
+                continue
+            group = TILE_GROUPS[draw]
+            result = shanten_with_group(others[group], draws[group][TILE_OFFSETS[draw]])
+            if closed and result >= current:
+                drawn_kinds = kinds + (held == 0)
+                drawn_pairs = pairs + (held == 1)
+                result = min(result, 6 - drawn_pairs + max(0, 7 - drawn_kinds))
+                if draw in TERMINAL_HONOR_SET:
+                    result = min(result, 13 - orphan_kinds - (held == 0) - (orphan_pair or held == 1))
+            if result < current:
+                accepting.append(draw)
+        counts[discard] += 1
+        results.append((discard, current, tuple(accepting)))
+    return results
+
+class DiscardEvaluator:
+    # Caches one draw table per suit or honor pattern. Patterns recur across
+    # hands far more often than whole hands do, and an entry is a few hundred
+    # bytes, so the default bound stays within a few MB per process.
+    def __init__(self, max_size=16384):
+        self.max_size = max_size
+        self.draw_table = lru_cache(maxsize=max_size)(draw_options)
+
+    def evaluate(self, counts, exposed=0):
+        return evaluate_discards(counts, exposed, self.draw_table)
+
+    def rank_discards(self, counts, unseen, exposed=0):
+        ranked = []
+        for discard, current, accepting in self.evaluate(counts, exposed):
+            ukeire = sum(max(0, unseen[draw]) for draw in accepting)
+            ranked.append((current, -ukeire, discard))
+        ranked.sort()
+        return [(discard, current, -ukeire) for current, ukeire, discard in ranked]
+
+    def best_discard(self, counts, unseen, exposed=0):
+        ranked = self.rank_discards(counts, unseen, exposed)
+        return ranked[0][0] if ranked else None
+
+    def cache_info(self):
+        info = self.draw_table.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+        }
+
+    def clear_cache(self):
+        self.draw_table.cache_clear()
+
+default_evaluator = DiscardEvaluator()
@@ -0,0 +1,137 @@
+from collections import deque
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+OFF = 100
+
+DEFAULT_CAPACITY = 10000
+
+MESSAGE = 0
+DRAW = 1
+DISCARD = 2
+FLOWER = 3
+MELD = 4
+KONG = 5
+WIN = 6
+ROUND_RESET = 7
+HIGH_SCORE = 8
+STRATEGY_ON = 9
+STRATEGY_OFF = 10
+HAND_ANALYSIS = 11
+ALL_PONG = 12
+PURE_TRIPLETS = 13
+STATE_HEADER = 14
+STATE_HAND = 15
+STATE_MELDS = 16
+STATE_KONGS = 17
+STATE_FLOWERS = 18
+FINAL_SCORES = 19
+GAME_SAVED = 20
+
+EVENT_FORMATS = {
+    MESSAGE: "{0}",
+    DRAW: "Player {0} drew {1}",
+    DISCARD: "Player {0} discarded {1}",
+    FLOWER: "Player {0} drew a {1.suit} tile and replaced it",
+    MELD: "Player {0} formed a meld with {1}",
+    KONG: "Player {0} formed a kong with {1}",
+    WIN: "Player {0} wins with a winning tile {1}",
+    ROUND_RESET: "Round reset completed.",
+    HIGH_SCORE: "Player {0} set a new highest score of {1}",
+    STRATEGY_ON: "Strategy mode activated.",
+    STRATEGY_OFF: "Strategy mode deactivated.",
+    HAND_ANALYSIS: "Player {0} has {1} possible meld(s) and {2} possible kong(s).",
+    ALL_PONG: "Player {0} has an all-pong hand.",
+    PURE_TRIPLETS: "Player {0} has a pure triplets hand.",
+    STATE_HEADER: "Analyzing game state...",
+    STATE_HAND: "Player {0}'s hand: {1}",
+    STATE_MELDS: "Player {0}'s melds: {1}",
+    STATE_KONGS: "Player {0}'s kongs: {1}",
+    STATE_FLOWERS: "Player {0}'s flowers: {1}",
+    FINAL_SCORES: "Final scores displayed.",
+    GAME_SAVED: "Game state saved to {0}.",
+}
+
+def render(value):
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(render(item) for item in value) + "]"
+    return str(value)
+
+def format_event(record):
+    _, event, args = record
+    return EVENT_FORMATS[event].format(*[render(arg) if isinstance(arg, (list, tuple)) else arg for arg in args])
+
+def _noop(event, *args):
+    pass
+
+class EventLog:
+    __slots__ = ('records', 'capacity', 'sink', 'batch_size', 'pending', 'dropped', 'level', 'debug', 'info', 'warning')
+
+    def __init__(self, level=INFO, capacity=DEFAULT_CAPACITY, sink=None, batch_size=256):
+        self.records = None
+        self.capacity = capacity
+        self.sink = open(sink, "a") if isinstance(sink, str) else sink
+        self.batch_size = batch_size
+        self.pending = []
+        self.dropped = 0
+        self.set_level(level)
+
+    def set_level(self, level):
+        self.level = level
+        if level < OFF and self.records is None:
+            self.records = deque(maxlen=self.capacity)
+        self.debug = self._emitter(DEBUG) if level <= DEBUG else _noop
+        self.info = self._emitter(INFO) if level <= INFO else _noop
+        self.warning = self._emitter(WARNING) if level <= WARNING else _noop
+
+    def is_enabled(self, level):
+        return level >= self.level
+
+    def _emitter(self, level):
+        records = self.records
+        pending = self.pending
+
+        if self.sink is None:
+            def emit(event, *args):
+                if len(records) == records.maxlen:
+                    self.dropped += 1
+                records.append((level, event, args))
+        else:
+            def emit(event, *args):
+                record = (level, event, args)
+                if len(records) == records.maxlen:
+                    self.dropped += 1
+                records.append(record)
+                pending.append(record)
+                if len(pending) >= self.batch_size:
+                    self.flush()
+        return emit
+
+    def flush(self):
+        if self.sink is not None and self.pending:
+            self.sink.write("".join(format_event(record) + "\n" for record in self.pending))
+            self.pending.clear()
+            self.sink.flush()
+
+    def close(self):
+        self.flush()
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+            self.set_level(self.level)
+
+    def clear(self):
+        if self.records is not None:
+            self.records.clear()
+
+    def messages(self, level=DEBUG):
+        if self.records is None:
+            return []
+        return [format_event(record) for record in self.records if record[0] >= level]
+
+    def __len__(self):
+        return len(self.records) if self.records is not None else 0
+
+    def __iter__(self):
+        return iter(self.records if self.records is not None else ())
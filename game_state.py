@@ -0,0 +1,152 @@
+from shanten import NUM_TILE_TYPES, is_agari, shanten
+
+class GameState:
+    __slots__ = ('wall', 'cursor', 'tail', 'dead_wall_size', 'hands', 'melds', 'kongs', 'flowers',
+                 'discards', 'visible', 'current_player', 'turn_count', 'undo_stack')
+
+    def __init__(self, wall, cursor=0, tail=None, dead_wall_size=16, hands=None, melds=None, kongs=None,
+                 flowers=None, discards=None, visible=None, current_player=0, turn_count=0):
+        self.wall = tuple(wall)
+        self.cursor = cursor
+        self.tail = len(self.wall) if tail is None else tail
+        self.dead_wall_size = dead_wall_size
+        self.hands = hands if hands is not None else [[0] * NUM_TILE_TYPES for _ in range(4)]
+        self.melds = melds if melds is not None else [[] for _ in range(4)]
+        self.kongs = kongs if kongs is not None else [[] for _ in range(4)]
+        self.flowers = flowers if flowers is not None else [0] * 4
+        self.discards = discards if discards is not None else []
+        self.visible = visible if visible is not None else [0] * NUM_TILE_TYPES
+        self.current_player = current_player
+        self.turn_count = turn_count
+        self.undo_stack = []
+
+    @classmethod
+    def from_game(cls, game):
+        round_discards = game.turn_history[len(game.turn_history) - len(game.discarded_tiles):]
+        return cls(
+            game.wall.ids,
+            cursor=game.wall.cursor,
+            tail=game.wall.tail,
+            dead_wall_size=game.wall.dead_wall_size,
+            hands=[list(counts) for counts in game.hand_counts],
+            melds=[[meld[0].id for meld in melds] for melds in game.melds],
+            kongs=[[kong[0].id for kong in kongs] for kongs in game.kongs],
+            flowers=[len(flowers) for flowers in game.flowers_in_hand],
+            discards=[(seat, tile.id) for seat, tile in round_discards],
+            visible=list(game.visible_counts),
+            current_player=game.current_player,
+            turn_count=game.turn_count,
+        )
+
+    def clone(self):
+        state = GameState.__new__(GameState)
+        state.wall = self.wall
+        state.cursor = self.cursor
+        state.tail = self.tail
+        state.dead_wall_size = self.dead_wall_size
+        state.hands = [hand[:] for hand in self.hands]
+        state.melds = [melds[:] for melds in self.melds]
+        state.kongs = [kongs[:] for kongs in self.kongs]
+        state.flowers = self.flowers[:]
+        state.discards = self.discards[:]
+        state.visible = self.visible[:]
+        state.current_player = self.current_player
+        state.turn_count = self.turn_count
+        state.undo_stack = []
+        return state
+
+    def live_remaining(self):
+        return max(0, self.tail - self.dead_wall_size - self.cursor)
+
+    def is_exhausted(self):
+        return self.cursor >= self.tail - self.dead_wall_size
+
+    def exposed_sets(self, seat):
+        return len(self.melds[seat]) + len(self.kongs[seat])
+
+    def is_win(self, seat=None):
+        if seat is None:
+            seat = self.current_player
+        return is_agari(self.hands[seat], self.exposed_sets(seat))
+
+    def shanten(self, seat=None):
+        if seat is None:
+            seat = self.current_player
+        return shanten(self.hands[seat], self.exposed_sets(seat))
+
+    def unseen_counts(self, seat):
+        hand = self.hands[seat]
+        visible = self.visible
+        return [4 - visible[tile_id] - hand[tile_id] for tile_id in range(NUM_TILE_TYPES)]
+
+    def draw(self):
+        if self.cursor >= self.tail - self.dead_wall_size:
+            return None
+        seat = self.current_player
+        cursor = self.cursor
+        tail = self.tail
+        tile_id = self.wall[cursor]
+        self.cursor = cursor + 1
+        bonus = 0
+        while tile_id >= NUM_TILE_TYPES and self.cursor < self.tail:
+            bonus += 1
+            self.tail -= 1
+            tile_id = self.wall[self.tail]
+        if tile_id >= NUM_TILE_TYPES:
+            bonus += 1
+            tile_id = None
+        else:
+            self.hands[seat][tile_id] += 1
+        self.flowers[seat] += bonus
+        self.undo_stack.append(('draw', seat, tile_id, cursor, tail, bonus))
+        return tile_id
+
+    def discard(self, tile_id):
+        seat = self.current_player
+        self.hands[seat][tile_id] -= 1
+        self.discards.append((seat, tile_id))
+        self.visible[tile_id] += 1
+        self.current_player = (seat + 1) % 4
+        self.turn_count += 1
+        self.undo_stack.append(('discard', seat, tile_id))
+
+    def meld(self, seat, tile_id):
+        self.hands[seat][tile_id] -= 3
+        self.melds[seat].append(tile_id)
+        self.visible[tile_id] += 3
+        self.undo_stack.append(('meld', seat, tile_id))
+
+    def kong(self, seat, tile_id):
+        self.hands[seat][tile_id] -= 4
+        self.kongs[seat].append(tile_id)
+        self.visible[tile_id] += 4
+        self.undo_stack.append(('kong', seat, tile_id))
+
+    def undo(self):
+        move = self.undo_stack.pop()
+        kind = move[0]
+        if kind == 'draw':
+            _, seat, tile_id, cursor, tail, bonus = move
+            if tile_id is not None:
+                self.hands[seat][tile_id] -= 1
+            self.flowers[seat] -= bonus
+            self.cursor = cursor
+            self.tail = tail
+        elif kind == 'discard':
+            _, seat, tile_id = move
+            self.hands[seat][tile_id] += 1
+            self.discards.pop()
+            self.visible[tile_id] -= 1
+            self.current_player = seat
+            self.turn_count -= 1
+        elif kind == 'meld':
+            _, seat, tile_id = move
+            self.hands[seat][tile_id] += 3
+            self.melds[seat].pop()
+            self.visible[tile_id] -= 3
+        elif kind == 'kong':
+            _, seat, tile_id = move
+            self.hands[seat][tile_id] += 4
+            self.kongs[seat].pop()
+            self.visible[tile_id] -= 4
+        return move
@@ -0,0 +1,163 @@
+import functools
+import gc
+import math
+import sys
+import time
+from bisect import bisect_left
+
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3,
+           2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, math.inf)
+
+class PhaseStats:
+    __slots__ = ('count', 'total', 'max', 'buckets', 'allocations')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.allocations = 0
+
+    def record(self, elapsed, allocations=0):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.buckets[bisect_left(BUCKETS, elapsed)] += 1
+        self.allocations += allocations
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "total_seconds": self.total,
+            "mean_seconds": self.total / self.count if self.count else 0.0,
+            "max_seconds": self.max,
+            "p50_seconds": self.percentile(0.50),
+            "p90_seconds": self.percentile(0.90),
+            "p99_seconds": self.percentile(0.99),
+            "allocated_blocks": self.allocations,
+        }
+
+class Instrumentation:
+    def __init__(self, track_allocations=False):
+        self.track_allocations = track_allocations
+        self.phases = {}
+        self.strategies = {}
+        self.caches = {}
+        self.wrappers = {}
+
+    def stats(self, table, name):
+        stats = table.get(name)
+        if stats is None:
+            stats = table[name] = PhaseStats()
+        return stats
+
+    def wrap(self, phase, function, strategy=None):
+        phase_stats = self.stats(self.phases, phase)
+        strategy_stats = self.stats(self.strategies, strategy) if strategy is not None else None
+        timer = time.perf_counter
+        track_allocations = self.track_allocations
+        allocated_blocks = sys.getallocatedblocks
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            blocks = allocated_blocks() if track_allocations else 0
+            start = timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = timer() - start
+                blocks = allocated_blocks() - blocks if track_allocations else 0
+                phase_stats.record(elapsed, blocks)
+                if strategy_stats is not None:
+                    strategy_stats.record(elapsed, blocks)
+        return timed
+
+    def wrapped(self, phase, function):
+        wrapper = self.wrappers.get((phase, function))
+        if wrapper is None:
+            wrapper = self.wrappers[phase, function] = self.wrap(phase, function)
+        return wrapper
+
+    def add_cache(self, name, cache_info):
+        self.caches[name] = cache_info
+
+    def reset(self):
+        for table in (self.phases, self.strategies):
+            for name in table:
+                table[name] = PhaseStats()
+
+    def cache_snapshot(self):
+        caches = {}
+        for name, cache_info in self.caches.items():
+            info = cache_info()
+            lookups = info["hits"] + info["misses"]
+            caches[name] = {
+                "hits": info["hits"],
+                "misses": info["misses"],
+                "hit_rate": info["hits"] / lookups if lookups else 0.0,
+            }
+        return caches
+
+    def snapshot(self):
+        return {
+            "phases": {name: stats.snapshot() for name, stats in self.phases.items()},
+            "strategies": {name: stats.snapshot() for name, stats in self.strategies.items()},
+            "caches": self.cache_snapshot(),
+            "gc": {f"generation_{index}": stats for index, stats in enumerate(gc.get_stats())},
+            "allocated_blocks": sys.getallocatedblocks(),
+        }
+
+    def to_prometheus(self, prefix="mahjong"):
+        lines = []
+
+        def histogram(metric, label, table, help_text):
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} histogram")
+            for name, stats in table.items():
+                cumulative = 0
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f'{prefix}_{metric}_bucket{{{label}="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_{metric}_sum{{{label}="{name}"}} {stats.total}')
+                lines.append(f'{prefix}_{metric}_count{{{label}="{name}"}} {stats.count}')
+
+        histogram("phase_seconds", "phase", self.phases, "Time spent in each game phase.")
+        histogram("strategy_decision_seconds", "strategy", self.strategies, "Time spent deciding a discard per strategy.")
+        if self.track_allocations:
+            lines.append(f"# HELP {prefix}_phase_allocated_blocks_total Net memory blocks allocated in each phase.")
+            lines.append(f"# TYPE {prefix}_phase_allocated_blocks_total counter")
+            for name, stats in self.phases.items():
+                lines.append(f'{prefix}_phase_allocated_blocks_total{{phase="{name}"}} {stats.allocations}')
+        caches = self.cache_snapshot()
+        for field in ("hits", "misses"):
+            lines.append(f"# HELP {prefix}_cache_{field}_total Cache {field}.")
+            lines.append(f"# TYPE {prefix}_cache_{field}_total counter")
+            for name, info in caches.items():
+                lines.append(f'{prefix}_cache_{field}_total{{cache="{name}"}} {info[field]}')
+        return "\n".join(lines) + "\n"
+
+def timed_method(phase, method):
+    @functools.wraps(method)
+    def timed(self, *args, **kwargs):
+        return self.instrumentation.wrapped(phase, method)(self, *args, **kwargs)
+    return timed
+
+@functools.lru_cache(maxsize=None)
+def instrumented_class(cls):
+    namespace = {'__slots__': (), 'uninstrumented_class': cls}
+    for phase, name in cls.instrumented_phases:
+        namespace[name] = timed_method(phase, getattr(cls, name))
+    return type(f"Instrumented{cls.__name__}", (cls,), namespace)
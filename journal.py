@@ -0,0 +1,73 @@
+import mmap
+import os
+import struct
+
+JOURNAL_MAGIC = b'MJJL'
+JOURNAL_VERSION = 1
+HEADER = struct.Struct('<4sH')
+RECORD = struct.Struct('<IHBBBB')
+
+DRAW = 1
+DISCARD = 2
+MELD = 3
+KONG = 4
+FLOWER = 5
+WIN = 6
+RESET = 7
+
+ACTION_NAMES = {DRAW: 'draw', DISCARD: 'discard', MELD: 'meld', KONG: 'kong', FLOWER: 'flower', WIN: 'win', RESET: 'reset'}
+
+class GameJournal:
+    def __init__(self, path, buffer_size=64 * 1024):
+        self.path = path
+        self.file = open(path, 'ab', buffering=buffer_size)
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION))
+            self.sequence = 0
+        else:
+            self.sequence = (os.path.getsize(path) - HEADER.size) // RECORD.size
+        self.pack = RECORD.pack
+        self.write = self.file.write
+
+    def append(self, action, seat, tile_id=0, turn=0, extra=0):
+        self.write(self.pack(self.sequence, turn & 0xFFFF, action, seat, tile_id, extra))
+        self.sequence += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class JournalReader:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = HEADER.unpack_from(self.map, 0)
+        if magic != JOURNAL_MAGIC:
+            raise ValueError(f"{path} is not a Mahjong journal")
+        if version != JOURNAL_VERSION:
+            raise ValueError(f"Unsupported journal version {version}")
+        self.count = (len(self.map) - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return RECORD.unpack_from(self.map, HEADER.size + index * RECORD.size)
+
+    def __iter__(self):
+        return RECORD.iter_unpack(memoryview(self.map)[HEADER.size:HEADER.size + self.count * RECORD.size])
+
+    def scan(self, action=None, seat=None):
+        for record in self:
+            if (action is None or record[2] == action) and (seat is None or record[3] == seat):
+                yield record
+
+    def close(self):
+        self.map.close()
+        self.file.close()
@@ -1,20 +1,142 @@
 import random
 import itertools
 import copy
+import struct
+from shanten import cache_info as shanten_cache_info, is_agari, is_seven_pairs, is_thirteen_orphans, shanten
+from efficiency import default_evaluator
+from game_state import GameState
+from monte_carlo import MonteCarloPlanner
+from journal import DISCARD, DRAW, FLOWER, KONG, MELD, RESET, WIN, GameJournal
+from event_log import DEBUG, INFO, OFF, EventLog
+from instrumentation import Instrumentation, instrumented_class
+from danger import DangerIndex
+from scoring import EARTHLY_HAND, HEAVENLY_HAND, score_hand
+import event_log as events
+
+NUM_TILE_TYPES = 34
+NUM_SUITED_TYPES = 27
+SUITED_SUITS = ['Bamboo', 'Characters', 'Dots']
+TILE_KEYS = ([(suit, str(rank)) for suit in SUITED_SUITS for rank in range(1, 10)]
+             + [('Wind', wind) for wind in ['East', 'South', 'West', 'North']]
+             + [('Dragon', dragon) for dragon in ['Red', 'Green', 'White']]
+             + [('Flower', flower) for flower in ['Peach', 'Chrysanthemum', 'Orchid', 'Plum']]
+             + [('Season', season) for season in ['Spring', 'Summer', 'Autumn', 'Winter']])
+TILE_IDS = {key: tile_id for tile_id, key in enumerate(TILE_KEYS)}
 
 class Tile:
-    def __init__(self, suit, rank):
-        self.suit = suit
-        self.rank = rank
+    __slots__ = ('suit', 'rank', 'id')
+    _interned = {}
+
+    def __new__(cls, suit, rank):
+        tile = cls._interned.get((suit, rank))
+        if tile is None:
+            tile = super().__new__(cls)
+            tile.suit = suit
+            tile.rank = rank
+            tile.id = TILE_IDS[(suit, rank)]
+            cls._interned[(suit, rank)] = tile
+        return tile
+
+    @staticmethod
+    def from_id(tile_id):
+        return TILES[tile_id]
+
+    def __reduce__(self):
+        return (Tile, (self.suit, self.rank))
 
     def __str__(self):
         return f"{self.rank} of {self.suit}"
 
     def __eq__(self, other):
-        return self.suit == other.suit and self.rank == other.rank
+        return self is other or (isinstance(other, Tile) and self.id == other.id)
 
     def __hash__(self):
-        return hash((self.suit, self.rank))
+        return self.id
+
+TILES = [Tile(suit, rank) for suit, rank in TILE_KEYS]
+
+SAVE_MAGIC = b'MJSV'
+SAVE_VERSION = 3
+
+class Wall:
+    __slots__ = ('ids', 'cursor', 'tail', 'dead_wall_size', 'counts')
+
+    def __init__(self, tiles, dead_wall_size=16, cursor=0, tail=None):
+        self.ids = bytes(tile.id for tile in tiles)
+        self.cursor = cursor
+        self.tail = len(self.ids) if tail is None else tail
+        self.dead_wall_size = dead_wall_size
+        self.counts = bytearray(len(TILE_KEYS))
+        for tile_id in self.ids[self.cursor:self.tail]:
+            self.counts[tile_id] += 1
+
+    @property
+    def tiles(self):
+        return [TILES[tile_id] for tile_id in self.ids]
+
+    def __len__(self):
+        return self.tail - self.cursor
+
+    def __iter__(self):
+        return (TILES[tile_id] for tile_id in self.ids[self.cursor:self.tail])
+
+    def live_remaining(self):
+        return max(0, self.tail - self.dead_wall_size - self.cursor)
+
+    def dead_remaining(self):
+        return min(self.dead_wall_size, self.tail - self.cursor)
+
+    def is_exhausted(self):
+        return self.cursor >= self.tail - self.dead_wall_size
+
+    def draw(self):
+        if self.cursor >= self.tail - self.dead_wall_size:
+            return None
+        tile_id = self.ids[self.cursor]
+        self.cursor += 1
+        self.counts[tile_id] -= 1
+        return TILES[tile_id]
+
+    def draw_replacement(self):
+        if self.cursor >= self.tail:
+            return None
+        self.tail -= 1
+        tile_id = self.ids[self.tail]
+        self.counts[tile_id] -= 1
+        return TILES[tile_id]
+
+class TurnHistory:
+    __slots__ = ('data',)
+
+    def __init__(self, entries=()):
+        self.data = bytearray()
+        for entry in entries:
+            self.append(entry)
+
+    def append(self, entry):
+        seat, tile = entry
+        self.data.append(seat)
+        self.data.append(tile.id)
+
+    def __len__(self):
+        return len(self.data) // 2
+
+    def clear(self):
+        self.data.clear()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.data[2 * index], TILES[self.data[2 * index + 1]]
+
+    def __iter__(self):
+        data = self.data
+        for offset in range(0, len(data), 2):
+            yield data[offset], TILES[data[offset + 1]]
 
 class Mahjong:
     suits = ['Bamboo', 'Characters', 'Dots', 'Winds', 'Dragons']
@@ -23,14 +145,27 @@ class Mahjong:
     dragon_tiles = ['Red', 'Green', 'White']
     flowers = ['Peach', 'Chrysanthemum', 'Orchid', 'Plum']
     seasons = ['Spring', 'Summer', 'Autumn', 'Winter']
-
-    def __init__(self):
-        self.tiles = self.generate_tiles()
-        self.flower_tiles = [Tile('Flower', flower) for flower in Mahjong.flowers]
-        self.season_tiles = [Tile('Season', season) for season in Mahjong.seasons]
+    flower_tiles = [Tile('Flower', flower) for flower in flowers]
+    season_tiles = [Tile('Season', season) for season in seasons]
+    __slots__ = ('seed', 'deals', 'headless', 'wall', 'players', 'hand_counts', 'discarded_tiles',
+                 'current_player', 'turn_count', 'melds', 'kongs', 'flowers_in_hand', 'points', 'winning_tiles',
+                 'turn_history', 'special_rules', 'event_log', 'strategy_mode', 'strategy_info', 'dealer_tiles',
+                 'current_dealer', 'replacement_tiles', 'num_draws', 'round_wins', 'rounds_played', 'max_rounds',
+                 'highest_score', 'visible_counts', 'special_hand_counts', 'last_score', 'discard_evaluator',
+                 'rollout_planner', 'journal', 'opponent_strategies', 'game_statistics', 'deck_history',
+                 'danger_index', 'decisions', 'decision_source', 'instrumentation', 'planner_settings')
+
+    instrumented_phases = [('draw', 'draw_from_wall'), ('flower_replacement', 'replace_flower'),
+                           ('discard', 'discard_tile'), ('win_check', 'check_for_win'), ('scoring', 'calculate_points')]
+
+    def __init__(self, seed=None, headless=False, event_log=None, instrumentation=None, planner_settings=None):
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.deals = 0
+        self.headless = headless
+        self.wall = Wall(self.generate_tiles())
         self.players = [[] for _ in range(4)]
+        self.hand_counts = [bytearray(NUM_TILE_TYPES) for _ in range(4)]
         self.discarded_tiles = []
-        self.wall_tiles = self.tiles.copy()
         self.current_player = 0
         self.turn_count = 0
         self.melds = [[] for _ in range(4)]
@@ -38,11 +173,11 @@ class Mahjong:
         self.flowers_in_hand = [[] for _ in range(4)]
         self.points = [0, 0, 0, 0]
         self.winning_tiles = []
-        self.turn_history = []
-        self.special_rules = {"heavenly_hand": False, "earthly_hand": False, "thirteen_orphans": False}
-        self.play_log = []
+        self.turn_history = TurnHistory()
+        self.special_rules = {"heavenly_hand": False, "earthly_hand": False, "thirteen_orphans": False, "seven_pairs": False}
+        self.event_log = event_log if event_log is not None else EventLog(OFF if headless else INFO)
         self.strategy_mode = False
-        self.strategy_info = []
+        self.strategy_info = None
         self.dealer_tiles = [None] * 4
         self.current_dealer = 0
         self.replacement_tiles = [None] * 4
@@ -51,13 +186,22 @@ class Mahjong:
         self.rounds_played = 0
         self.max_rounds = 4
         self.highest_score = [0, 0, 0, 0]
-        self.card_counts = {suit: {rank: 0 for rank in Mahjong.ranks} for suit in Mahjong.suits}
-        self.suit_frequency = {suit: 0 for suit in Mahjong.suits}
-        self.rank_frequency = {rank: 0 for rank in Mahjong.ranks}
+        self.reset_wall_statistics()
         self.special_hand_counts = { "all_pong": 0, "pure_triplets": 0 }
-        self.opponent_strategies = [self.default_strategy, self.aggressive_strategy, self.defensive_strategy]
+        self.last_score = None
+        self.discard_evaluator = default_evaluator
+        self.rollout_planner = None
+        self.planner_settings = planner_settings
+        self.journal = None
+        self.opponent_strategies = [self.default_strategy, self.aggressive_strategy, self.defensive_strategy, self.efficiency_strategy]
         self.game_statistics = {'turns': 0, 'draws': 0, 'discards': 0, 'melds': 0, 'kongs': 0}
-        self.deck_history = []
+        self.deck_history = bytearray()
+        self.danger_index = None
+        self.decisions = None
+        self.decision_source = None
+        self.instrumentation = None
+        if instrumentation is not None:
+            self.enable_instrumentation(instrumentation)
 
     def generate_tiles(self):
         tiles = []
@@ -73,30 +217,67 @@ class Mahjong:
                 tiles.append(Tile('Dragon', dragon))
         tiles.extend(self.flower_tiles * 4)
         tiles.extend(self.season_tiles * 4)
-        random.shuffle(tiles)
+        random.Random(f"{self.seed}:{self.deals}").shuffle(tiles)
+        self.deals += 1
         return tiles
 
     def draw_tile(self):
-        tile = self.tiles.pop()
-        self.wall_tiles.remove(tile)
-        self.deck_history.append(tile)
+        tile = self.wall.draw()
+        if tile is None:
+            return None
+        self.deck_history.append(tile.id)
         self.game_statistics['draws'] += 1
         return tile
 
     def deal_hand(self):
-        for player in self.players:
+        for seat, player in enumerate(self.players):
             for _ in range(13):
                 tile = self.draw_tile()
-                player.append(tile)
+                self.add_tile_to_hand(seat, tile)
                 self.check_special_tiles(player, tile)
 
+    def seat_of(self, player):
+        for seat, hand in enumerate(self.players):
+            if hand is player:
+                return seat
+        return None
+
+    def add_tile_to_hand(self, seat, tile):
+        self.players[seat].append(tile)
+        if tile.id < NUM_TILE_TYPES:
+            self.hand_counts[seat][tile.id] += 1
+        if self.journal is not None:
+            self.journal.append(DRAW, seat, tile.id, self.turn_count)
+
+    def remove_tile_from_hand(self, seat, tile):
+        self.players[seat].remove(tile)
+        if tile.id < NUM_TILE_TYPES:
+            self.hand_counts[seat][tile.id] -= 1
+
+    def tile_counts(self, player):
+        seat = self.seat_of(player)
+        if seat is not None:
+            return self.hand_counts[seat]
+        counts = [0] * NUM_TILE_TYPES
+        for tile in player:
+            if tile.id < NUM_TILE_TYPES:
+                counts[tile.id] += 1
+        return counts
+
     def discard_tile(self, tile):
+        if self.decisions is not None:
+            self.decisions.append(tile.id)
         if tile in self.players[self.current_player]:
-            self.players[self.current_player].remove(tile)
+            self.remove_tile_from_hand(self.current_player, tile)
             self.discarded_tiles.append(tile)
+            self.visible_counts[tile.id] += 1
+            if self.danger_index is not None:
+                self.danger_index.discard(self.current_player, tile.id)
             self.turn_history.append((self.current_player, tile))
+            if self.journal is not None:
+                self.journal.append(DISCARD, self.current_player, tile.id, self.turn_count)
             self.game_statistics['discards'] += 1
-            self.log_play(f"Player {self.current_player + 1} discarded {tile}")
+            self.event_log.info(events.DISCARD, self.current_player + 1, tile)
 
     def show_hand(self, player=None):
         if player is None:
@@ -107,87 +288,129 @@ class Mahjong:
         return [str(tile) for tile in self.discarded_tiles]
 
     def draw_from_wall(self):
-        if len(self.wall_tiles) > 0:
+        if not self.wall.is_exhausted():
             return self.draw_tile()
         return None
 
-    def check_for_win(self):
-        return len(self.players[self.current_player]) == 14
+    def draw_replacement_tile(self):
+        tile = self.wall.draw_replacement()
+        if tile is not None:
+            self.deck_history.append(tile.id)
+            self.game_statistics['draws'] += 1
+        return tile
+
+    def exposed_sets(self, player):
+        return len(self.melds[player]) + len(self.kongs[player])
+
+    def check_for_win(self, player=None):
+        if player is None:
+            player = self.current_player
+        return is_agari(self.hand_counts[player], self.exposed_sets(player))
+
+    def calculate_shanten(self, player=None):
+        if player is None:
+            player = self.current_player
+        return shanten(self.hand_counts[player], self.exposed_sets(player))
 
     def check_special_tiles(self, player, tile):
         if tile.suit == 'Flower' or tile.suit == 'Season':
-            player.remove(tile)
-            self.flowers_in_hand[self.players.index(player)].append(tile)
-            player.append(self.draw_from_wall())
-            self.log_play(f"Player {self.players.index(player) + 1} drew a {tile.suit} tile and replaced it")
+            self.replace_flower(player, tile)
+
+    def replace_flower(self, player, tile):
+        seat = self.seat_of(player)
+        while tile is not None and (tile.suit == 'Flower' or tile.suit == 'Season'):
+            self.remove_tile_from_hand(seat, tile)
+            self.flowers_in_hand[seat].append(tile)
+            if self.journal is not None:
+                self.journal.append(FLOWER, seat, tile.id, self.turn_count)
+            replacement = self.draw_replacement_tile()
+            self.event_log.info(events.FLOWER, seat + 1, tile)
+            if replacement is not None:
+                self.add_tile_to_hand(seat, replacement)
+            tile = replacement
 
     def add_to_meld(self, player, tiles):
         if len(tiles) == 3:
-            self.melds[self.players.index(player)].append(tiles)
+            seat = self.seat_of(player)
+            self.melds[seat].append(tiles)
             for tile in tiles:
-                player.remove(tile)
+                self.remove_tile_from_hand(seat, tile)
+                self.visible_counts[tile.id] += 1
             self.game_statistics['melds'] += 1
-            self.log_play(f"Player {self.players.index(player) + 1} formed a meld with {tiles}")
+            if self.danger_index is not None:
+                self.danger_index.expose(seat, tiles[0].id, len(tiles))
+            if self.journal is not None:
+                self.journal.append(MELD, seat, tiles[0].id, self.turn_count)
+            self.event_log.info(events.MELD, seat + 1, tiles)
 
     def add_to_kong(self, player, tiles):
         if len(tiles) == 4:
-            self.kongs[self.players.index(player)].append(tiles)
+            seat = self.seat_of(player)
+            self.kongs[seat].append(tiles)
             for tile in tiles:
-                player.remove(tile)
+                self.remove_tile_from_hand(seat, tile)
+                self.visible_counts[tile.id] += 1
             self.game_statistics['kongs'] += 1
-            self.log_play(f"Player {self.players.index(player) + 1} formed a kong with {tiles}")
-
-    def calculate_points(self, player):
-        points = 0
-        points += len(self.melds[player]) * 2
-        points += len(self.kongs[player]) * 8
-        points += len(self.flowers_in_hand[player]) * 4
+            if self.danger_index is not None:
+                self.danger_index.expose(seat, tiles[0].id, len(tiles))
+            if self.journal is not None:
+                self.journal.append(KONG, seat, tiles[0].id, self.turn_count)
+            self.event_log.info(events.KONG, seat + 1, tiles)
+
+    def scoring_flags(self, player):
+        flags = set()
         if self.special_rules["heavenly_hand"] and player == 0 and self.turn_count == 0:
-            points += 100
+            flags.add(HEAVENLY_HAND)
         if self.special_rules["earthly_hand"] and player == 0 and self.turn_count == 1:
-            points += 50
-        if self.check_thirteen_orphans(player):
-            points += 200
+            flags.add(EARTHLY_HAND)
+        return flags
+
+    def score_player(self, player):
+        return score_hand(self.hand_counts[player], [meld[0].id for meld in self.melds[player]],
+                          [kong[0].id for kong in self.kongs[player]], len(self.flowers_in_hand[player]),
+                          self.scoring_flags(player))
+
+    def calculate_points(self, player):
+        score = self.score_player(player)
+        if 'thirteen_orphans' in score.patterns:
             self.special_rules["thirteen_orphans"] = True
-        self.points[player] = points
-        self.update_highest_score(player, points)
-        return points
+        self.last_score = score
+        self.points[player] = score.points
+        self.update_highest_score(player, score.points)
+        return score.points
 
-    def check_special_rules(self):
-        if self.turn_count == 0 and self.check_for_win():
+    def check_special_rules(self, win=None):
+        if win is None:
+            win = self.check_for_win()
+        if self.turn_count == 0 and win:
             self.special_rules["heavenly_hand"] = True
-        if self.turn_count == 1 and self.check_for_win():
+        if self.turn_count == 1 and win:
             self.special_rules["earthly_hand"] = True
+        if win and is_seven_pairs(self.hand_counts[self.current_player]):
+            self.special_rules["seven_pairs"] = True
 
     def check_thirteen_orphans(self, player):
-        necessary_tiles = [
-            Tile('Characters', '1'), Tile('Characters', '9'),
-            Tile('Bamboo', '1'), Tile('Bamboo', '9'),
-            Tile('Dots', '1'), Tile('Dots', '9'),
-            Tile('Wind', 'East'), Tile('Wind', 'South'),
-            Tile('Wind', 'West'), Tile('Wind', 'North'),
-            Tile('Dragon', 'Red'), Tile('Dragon', 'Green'),
-            Tile('Dragon', 'White')
-        ]
-        hand_tiles = self.players[player]
-        for necessary_tile in necessary_tiles:
-            if not any(str(necessary_tile) == str(tile) for tile in hand_tiles):
-                return False
-        return True
+        return is_thirteen_orphans(self.hand_counts[player])
 
     def log_play(self, message):
-        self.play_log.append(message)
+        self.event_log.info(events.MESSAGE, message)
+
+    @property
+    def play_log(self):
+        return self.event_log.messages()
 
     def activate_strategy_mode(self):
         self.strategy_mode = True
-        self.log_play("Strategy mode activated.")
-        self.analyze_player_hands()
+        self.event_log.info(events.STRATEGY_ON)
+        if not self.headless:
+            self.analyze_player_hands()
 
     def deactivate_strategy_mode(self):
         self.strategy_mode = False
-        self.log_play("Strategy mode deactivated.")
+        self.event_log.info(events.STRATEGY_OFF)
 
     def analyze_player_hands(self):
+        self.strategy_info = []
         for i, player in enumerate(self.players):
             possible_melds = self.find_possible_melds(player)
             possible_kongs = self.find_possible_kongs(player)
@@ -197,33 +420,15 @@ class Mahjong:
                 "possible_kongs": possible_kongs,
                 "hand": [str(tile) for tile in player]
             })
-            self.log_play(f"Player {i + 1} has {len(possible_melds)} possible meld(s) and {len(possible_kongs)} possible kong(s).")
+            self.event_log.info(events.HAND_ANALYSIS, i + 1, len(possible_melds), len(possible_kongs))
 
     def find_possible_melds(self, player):
-        possible_melds = []
-        tile_counts = {}
-        for tile in player:
-            key = (tile.suit, tile.rank)
-            if key not in tile_counts:
-                tile_counts[key] = 0
-            tile_counts[key] += 1
-        for (suit, rank), count in tile_counts.items():
-            if count >= 3:
-                possible_melds.append([Tile(suit, rank)] * 3)
-        return possible_melds
+        counts = self.tile_counts(player)
+        return [[TILES[tile_id]] * 3 for tile_id in range(NUM_TILE_TYPES) if counts[tile_id] >= 3]
 
     def find_possible_kongs(self, player):
-        possible_kongs = []
-        tile_counts = {}
-        for tile in player:
-            key = (tile.suit, tile.rank)
-            if key not in tile_counts:
-                tile_counts[key] = 0
-            tile_counts[key] += 1
-        for (suit, rank), count in tile_counts.items():
-            if count == 4:
-                possible_kongs.append([Tile(suit, rank)] * 4)
-        return possible_kongs
+        counts = self.tile_counts(player)
+        return [[TILES[tile_id]] * 4 for tile_id in range(NUM_TILE_TYPES) if counts[tile_id] == 4]
 
     def advanced_ai_strategy(self, player):
         if self.strategy_mode:
@@ -249,15 +454,11 @@ class Mahjong:
         return player[0] if len(player) > 0 else None
 
     def find_most_disposable_tile(self, player):
-        tile_counts = {}
-        for tile in player:
-            key = (tile.suit, tile.rank)
-            if key not in tile_counts:
-                tile_counts[key] = 0
-            tile_counts[key] += 1
+        counts = self.tile_counts(player)
         most_disposable_tile = None
         min_count = float('inf')
-        for tile, count in tile_counts.items():
+        for tile in player:
+            count = counts[tile.id] if tile.id < NUM_TILE_TYPES else 0
             if count < min_count:
                 min_count = count
                 most_disposable_tile = tile
@@ -272,12 +473,12 @@ class Mahjong:
         return self.find_safe_tile_to_discard(player)
 
     def find_safe_tile_to_discard(self, player):
-        possible_melds = self.find_possible_melds(player)
-        possible_kongs = self.find_possible_kongs(player)
-        for tile in player:
-            if self.is_tile_safe_to_discard(tile, possible_melds, possible_kongs):
-                return tile
-        return player[0] if len(player) > 0 else None
+        if not player:
+            return None
+        seat = self.seat_of(player)
+        if self.danger_index is None:
+            self.rebuild_danger_index()
+        return self.danger_index.safest(seat, player, self.hand_counts[seat])
 
     def is_tile_safe_to_discard(self, tile, possible_melds, possible_kongs):
         for meld in possible_melds:
@@ -288,83 +489,207 @@ class Mahjong:
                 return False
         return True
 
+    def efficiency_strategy(self, player):
+        if self.strategy_mode:
+            return self.suggest_efficient_discard(player)
+        return None
+
+    def suggest_efficient_discard(self, player):
+        seat = self.seat_of(player)
+        tile_id = self.discard_evaluator.best_discard(self.hand_counts[seat], self.unseen_counts(seat), self.exposed_sets(seat))
+        if tile_id is None:
+            return player[0] if len(player) > 0 else None
+        return TILES[tile_id]
+
+    def monte_carlo_strategy(self, player):
+        if self.strategy_mode:
+            return self.suggest_monte_carlo_discard(player)
+        return None
+
+    def suggest_monte_carlo_discard(self, player):
+        if self.rollout_planner is None:
+            settings = {"seed": f"{self.seed}:planner", **(self.planner_settings or {})}
+            self.rollout_planner = MonteCarloPlanner(**settings)
+        tile_id = self.rollout_planner.choose_discard(self.snapshot_state(), self.seat_of(player))
+        if tile_id is None:
+            return player[0] if len(player) > 0 else None
+        return TILES[tile_id]
+
     def play_turn(self):
+        drawn_tile = self.draw_turn_tile()
+        if not drawn_tile:
+            return False
+        win = self.settle_win()
+        if not win:
+            self.discard_tile(self.choose_discard())
+        self.advance_turn()
+        return win
+
+    def draw_turn_tile(self):
         drawn_tile = self.draw_from_wall()
         if drawn_tile:
-            self.players[self.current_player].append(drawn_tile)
+            self.add_tile_to_hand(self.current_player, drawn_tile)
             self.check_special_tiles(self.players[self.current_player], drawn_tile)
-            self.log_play(f"Player {self.current_player + 1} drew {drawn_tile}")
-            suggested_discard = self.opponent_strategies[self.current_player](self.players[self.current_player])
-            if suggested_discard:
-                self.discard_tile(suggested_discard)
-            else:
-                self.discard_tile(self.players[self.current_player][0])
-            win = self.check_for_win()
-            self.check_special_rules()
-            if win:
-                self.winning_tiles.append(drawn_tile)
-                self.log_play(f"Player {self.current_player + 1} wins with a winning tile {drawn_tile}")
-                self.round_wins[self.current_player] += 1
-                self.reset_round()
-            self.current_player = (self.current_player + 1) % 4
-            self.turn_count += 1
-            self.game_statistics['turns'] += 1
-            return win
-        return False
+            self.event_log.info(events.DRAW, self.current_player + 1, drawn_tile)
+        return drawn_tile
+
+    def settle_win(self):
+        win = self.check_for_win()
+        if win:
+            winning_tile = self.players[self.current_player][-1]
+            self.check_special_rules(win)
+            self.winning_tiles.append(winning_tile)
+            if self.journal is not None:
+                self.journal.append(WIN, self.current_player, winning_tile.id, self.turn_count)
+            self.calculate_points(self.current_player)
+            self.update_special_hand_counts(self.current_player, self.last_score)
+            self.event_log.info(events.WIN, self.current_player + 1, winning_tile)
+            self.round_wins[self.current_player] += 1
+        return win
+
+    def choose_discard(self):
+        if self.decision_source is not None:
+            return self.decision_source()
+        strategy = self.opponent_strategies[self.current_player % len(self.opponent_strategies)]
+        suggested_discard = strategy(self.players[self.current_player])
+        if suggested_discard:
+            return suggested_discard
+        return self.players[self.current_player][0]
+
+    def advance_turn(self):
+        self.current_player = (self.current_player + 1) % 4
+        self.turn_count += 1
+        self.game_statistics['turns'] += 1
 
     def reset_round(self):
+        if self.journal is not None:
+            self.journal.append(RESET, self.current_dealer, 0, self.turn_count)
         self.turn_count = 0
         self.discarded_tiles.clear()
+        self.turn_history.clear()
+        self.deck_history.clear()
+        self.danger_index = None
         self.current_dealer = (self.current_dealer + 1) % 4
+        self.wall = Wall(self.generate_tiles())
+        self.reset_wall_statistics()
         self.players = [[] for _ in range(4)]
+        self.hand_counts = [bytearray(NUM_TILE_TYPES) for _ in range(4)]
+        self.melds = [[] for _ in range(4)]
+        self.kongs = [[] for _ in range(4)]
+        self.flowers_in_hand = [[] for _ in range(4)]
         self.deal_hand()
-        self.log_play("Round reset completed.")
+        self.event_log.info(events.ROUND_RESET)
 
     def play_game(self):
-        while self.rounds_played < self.max_rounds:
+        if not any(self.players):
             self.deal_hand()
-            while True:
+        while self.rounds_played < self.max_rounds:
+            if not self.headless:
                 print(f"Player {self.current_player + 1}'s turn")
                 print("Current hand:", self.show_hand())
                 print("Discarded tiles:", self.show_discarded_tiles())
                 print("Melds:", self.melds[self.current_player])
                 print("Kongs:", self.kongs[self.current_player])
                 print("Flowers:", self.flowers_in_hand[self.current_player])
-                if not self.strategy_mode:
-                    self.activate_strategy_mode()
-                win = self.play_turn()
+            if not self.strategy_mode:
+                self.activate_strategy_mode()
+            player = self.current_player
+            win = self.play_turn()
+            if not self.headless:
                 if win:
-                    print(f"Player {self.current_player + 1} has won this round!")
-                    break
-            self.rounds_played += 1
-        self.display_final_scores()
+                    print(f"Player {player + 1} has won this round!")
+                elif self.wall.is_exhausted():
+                    print("The wall is exhausted, this round is a draw.")
+            self.finish_turn(win)
+        if not self.headless:
+            self.display_final_scores()
+        self.event_log.flush()
+
+    def finish_turn(self, win):
+        if not win and not self.wall.is_exhausted():
+            return False
+        if not win:
+            self.num_draws += 1
+        self.reset_round()
+        self.rounds_played += 1
+        return True
 
     def display_final_scores(self):
         for i, points in enumerate(self.points):
             print(f"Player {i + 1} scored {points} points")
         for i, wins in enumerate(self.round_wins):
             print(f"Player {i + 1} won {wins} rounds")
-        self.log_play("Final scores displayed.")
+        self.event_log.info(events.FINAL_SCORES)
 
     def start(self):
         self.play_game()
 
+    def set_strategies(self, names):
+        self.opponent_strategies = [getattr(self, f"{name}_strategy") for name in names]
+        if self.instrumentation is not None:
+            self.opponent_strategies = [self.instrument_strategy(strategy) for strategy in self.opponent_strategies]
+
+    def enable_instrumentation(self, instrumentation=None, track_allocations=False):
+        if self.instrumentation is not None:
+            self.disable_instrumentation()
+        if instrumentation is None or instrumentation is True:
+            instrumentation = Instrumentation(track_allocations)
+        self.instrumentation = instrumentation
+        for phase, _ in self.instrumented_phases:
+            instrumentation.stats(instrumentation.phases, phase)
+        self.__class__ = instrumented_class(type(self))
+        self.opponent_strategies = [self.instrument_strategy(strategy) for strategy in self.opponent_strategies]
+        instrumentation.add_cache("discard_evaluator", self.discard_evaluator.cache_info)
+        instrumentation.add_cache("shanten", shanten_cache_info)
+        return instrumentation
+
+    def instrument_strategy(self, strategy):
+        name = strategy.__name__[:-len('_strategy')]
+        return self.instrumentation.wrap('strategy', strategy, strategy=name)
+
+    def disable_instrumentation(self):
+        self.__class__ = getattr(type(self), 'uninstrumented_class', type(self))
+        self.opponent_strategies = [getattr(strategy, '__wrapped__', strategy) for strategy in self.opponent_strategies]
+        self.instrumentation = None
+
     def update_highest_score(self, player, points):
         if points > self.highest_score[player]:
             self.highest_score[player] = points
-            self.log_play(f"Player {player + 1} set a new highest score of {points}")
+            self.event_log.info(events.HIGH_SCORE, player + 1, points)
+
+    def reset_wall_statistics(self):
+        self.visible_counts = bytearray(NUM_TILE_TYPES)
+
+    def remaining_in_wall(self, tile):
+        return self.wall.counts[tile.id]
+
+    def unseen_counts(self, player):
+        hand = self.hand_counts[player]
+        visible = self.visible_counts
+        return [4 - visible[tile_id] - hand[tile_id] for tile_id in range(NUM_TILE_TYPES)]
+
+    def snapshot_state(self):
+        return GameState.from_game(self)
 
     def track_tile_frequency(self):
-        self.card_counts = {suit: {rank: 0 for rank in Mahjong.ranks} for suit in Mahjong.suits}
-        for suit in Mahjong.suits:
-            for rank in Mahjong.ranks:
-                self.card_counts[suit][rank] = sum(tile.rank == rank for tile in self.wall_tiles if tile.suit == suit)
+        card_counts = {suit: {rank: 0 for rank in Mahjong.ranks} for suit in Mahjong.suits}
+        for tile_id in range(NUM_SUITED_TYPES):
+            suit, rank = TILE_KEYS[tile_id]
+            card_counts[suit][rank] = self.wall.counts[tile_id]
+        return card_counts
 
     def track_suit_frequency(self):
-        self.suit_frequency = {suit: sum(tile.suit == suit for tile in self.wall_tiles) for suit in Mahjong.suits}
+        suit_frequency = {suit: 0 for suit in Mahjong.suits}
+        for tile_id in range(NUM_SUITED_TYPES):
+            suit_frequency[TILE_KEYS[tile_id][0]] += self.wall.counts[tile_id]
+        return suit_frequency
 
     def track_rank_frequency(self):
-        self.rank_frequency = {rank: sum(tile.rank == rank for tile in self.wall_tiles) for rank in Mahjong.ranks}
+        rank_frequency = {rank: 0 for rank in Mahjong.ranks}
+        for tile_id in range(NUM_SUITED_TYPES):
+            rank_frequency[TILE_KEYS[tile_id][1]] += self.wall.counts[tile_id]
+        return rank_frequency
+
     def show_hand_(self, player=None):
         if player is None:
             player = self.current_player
@@ -374,7 +699,7 @@ class Mahjong:
         return [str(tile) for tile in self.discarded_tiles]
 
     def draw_from_walll(self):
-        if len(self.wall_tiles) > 0:
+        if not self.wall.is_exhausted():
             return self.draw_tile()
         return None
 
@@ -384,23 +709,26 @@ class Mahjong:
     def check_special_tiiles(self, player, tile):
         if tile.suit == 'Flower' or tile.suit == 'Season':
             player.remove(tile)
-            self.flowers[self.players.index(player)].append(tile)
+            seat = self.seat_of(player)
+            self.flowers_in_hand[seat].append(tile)
             player.append(self.draw_from_wall())
-            self.log_play(f"Player {self.players.index(player) + 1} drew a {tile.suit} tile and replaced it")
+            self.log_play(f"Player {seat + 1} drew a {tile.suit} tile and replaced it")
 
     def add_to_melld(self, player, tiles):
         if len(tiles) == 3:
-            self.melds[self.players.index(player)].append(tiles)
+            seat = self.seat_of(player)
+            self.melds[seat].append(tiles)
             for tile in tiles:
                 player.remove(tile)
-            self.log_play(f"Player {self.players.index(player) + 1} formed a meld with {tiles}")
+            self.log_play(f"Player {seat + 1} formed a meld with {tiles}")
 
     def add_to_kongg(self, player, tiles):
         if len(tiles) == 4:
-            self.kongs[self.players.index(player)].append(tiles)
+            seat = self.seat_of(player)
+            self.kongs[seat].append(tiles)
             for tile in tiles:
                 player.remove(tile)
-            self.log_play(f"Player {self.players.index(player) + 1} formed a kong with {tiles}")
+            self.log_play(f"Player {seat + 1} formed a kong with {tiles}")
 
     def calculate_poiints(self, player):
         points = 0
@@ -417,16 +745,15 @@ class Mahjong:
         self.points[player] = points
         self.update_highest_score(player, points)
         return points
-    def update_special_hand_counts(self, player):
-        hand = self.players[player]
-        all_pong = all(tile.rank in ['1', '9'] for tile in hand) and len(hand) == 14
-        if all_pong:
+    def update_special_hand_counts(self, player, score=None):
+        if score is None:
+            score = self.score_player(player)
+        if 'all_pongs' in score.patterns:
             self.special_hand_counts["all_pong"] += 1
-            self.log_play(f"Player {player + 1} has an all-pong hand.")
-        pure_triplets = all(tile.suit == 'Characters' and tile.rank in ['1', '9'] for tile in hand)
-        if pure_triplets:
-            self.special_hand_counts["pure_triplets"] += 1
-            self.log_play(f"Player {player + 1} has a pure triplets hand.")
+            self.event_log.info(events.ALL_PONG, player + 1)
+            if 'pure_flush' in score.patterns:
+                self.special_hand_counts["pure_triplets"] += 1
+                self.event_log.info(events.PURE_TRIPLETS, player + 1)
 
     def default_strategy(self, player):
         if self.strategy_mode:
@@ -441,48 +768,143 @@ class Mahjong:
         return None
 
     def analyze_game_state(self):
-        self.log_play(f"Analyzing game state...")
+        if not self.event_log.is_enabled(DEBUG):
+            return
+        debug = self.event_log.debug
+        debug(events.STATE_HEADER)
         for i, player in enumerate(self.players):
-            self.log_play(f"Player {i + 1}'s hand: {[str(tile) for tile in player]}")
-            self.log_play(f"Player {i + 1}'s melds: {self.melds[i]}")
-            self.log_play(f"Player {i + 1}'s kongs: {self.kongs[i]}")
-            self.log_play(f"Player {i + 1}'s flowers: {self.flowers_in_hand[i]}")
-
-    def save_game_state(self):
-        self.log_play("Saving game state...")
-        game_state = {
-            "players": [[str(tile) for tile in player] for player in self.players],
-            "discarded_tiles": [str(tile) for tile in self.discarded_tiles],
-            "current_player": self.current_player,
-            "turn_count": self.turn_count,
-            "wall_tiles": [str(tile) for tile in self.wall_tiles],
-            "melds": self.melds,
-            "kongs": self.kongs,
-            "flowers_in_hand": self.flowers_in_hand,
-            "points": self.points,
-            "winning_tiles": [str(tile) for tile in self.winning_tiles],
-            "special_rules": self.special_rules,
-            "play_log": self.play_log,
-            "strategy_info": self.strategy_info,
-            "dealer_tiles": self.dealer_tiles,
-            "current_dealer": self.current_dealer,
-            "replacement_tiles": self.replacement_tiles,
-            "num_draws": self.num_draws,
-            "round_wins": self.round_wins,
-            "rounds_played": self.rounds_played,
-            "max_rounds": self.max_rounds,
-            "highest_score": self.highest_score,
-            "card_counts": self.card_counts,
-            "suit_frequency": self.suit_frequency,
-            "rank_frequency": self.rank_frequency,
-            "special_hand_counts": self.special_hand_counts,
-            "opponent_strategies": [str(strategy) for strategy in self.opponent_strategies],
-            "game_statistics": self.game_statistics,
-            "deck_history": [str(tile) for tile in self.deck_history]
-        }
-        with open("game_state.txt", "w") as f:
-            f.write(str(game_state))
-        self.log_play("Game state saved to game_state.txt.")
+            debug(events.STATE_HAND, i + 1, tuple(player))
+            debug(events.STATE_MELDS, i + 1, tuple(self.melds[i]))
+            debug(events.STATE_KONGS, i + 1, tuple(self.kongs[i]))
+            debug(events.STATE_FLOWERS, i + 1, tuple(self.flowers_in_hand[i]))
+
+    def record_decisions(self):
+        self.decisions = bytearray()
+        return self.decisions
+
+    def attach_journal(self, path):
+        self.journal = GameJournal(path)
+        return self.journal
+
+    def strategy_names(self):
+        return [strategy.__name__[:-len('_strategy')] for strategy in self.opponent_strategies]
+
+    def to_bytes(self):
+        out = bytearray(struct.pack('<4sH', SAVE_MAGIC, SAVE_VERSION))
+
+        def pack_ids(ids):
+            ids = bytes(ids)
+            out.extend(struct.pack('<I', len(ids)))
+            out.extend(ids)
+
+        out.extend(struct.pack('<BBIIIIB', self.current_player, self.current_dealer, self.turn_count,
+                               self.num_draws, self.rounds_played, self.max_rounds, self.strategy_mode))
+        out.extend(struct.pack('<B', sum(1 << bit for bit, flag in enumerate(self.special_rules.values()) if flag)))
+        for values in (self.points, self.round_wins, self.highest_score):
+            out.extend(struct.pack('<4i', *values))
+        out.extend(struct.pack(f'<{len(self.game_statistics)}I', *self.game_statistics.values()))
+        out.extend(struct.pack(f'<{len(self.special_hand_counts)}I', *self.special_hand_counts.values()))
+        pack_ids(','.join(self.strategy_names()).encode())
+        pack_ids(str(self.seed).encode())
+        out.extend(struct.pack('<I', self.deals))
+        out.extend(struct.pack('<HHH', self.wall.cursor, self.wall.tail, self.wall.dead_wall_size))
+        pack_ids(self.wall.ids)
+        for seat in range(4):
+            pack_ids(tile.id for tile in self.players[seat])
+            pack_ids(meld[0].id for meld in self.melds[seat])
+            pack_ids(kong[0].id for kong in self.kongs[seat])
+            pack_ids(tile.id for tile in self.flowers_in_hand[seat])
+        pack_ids(tile.id for tile in self.discarded_tiles)
+        pack_ids(seat for seat, _ in self.turn_history)
+        pack_ids(tile.id for _, tile in self.turn_history)
+        pack_ids(tile.id for tile in self.winning_tiles)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data, headless=False):
+        view = memoryview(data)
+        offset = 0
+
+        def read(fmt):
+            nonlocal offset
+            values = struct.unpack_from(fmt, view, offset)
+            offset += struct.calcsize(fmt)
+            return values
+
+        def read_ids():
+            nonlocal offset
+            (length,) = read('<I')
+            ids = bytes(view[offset:offset + length])
+            offset += length
+            return ids
+
+        def read_tiles():
+            return [TILES[tile_id] for tile_id in read_ids()]
+
+        magic, version = read('<4sH')
+        if magic != SAVE_MAGIC:
+            raise ValueError("Not a Mahjong save file")
+        if version != SAVE_VERSION:
+            raise ValueError(f"Unsupported save version {version}")
+        game = cls(headless=headless)
+        (game.current_player, game.current_dealer, game.turn_count, game.num_draws,
+         game.rounds_played, game.max_rounds, strategy_mode) = read('<BBIIIIB')
+        game.strategy_mode = bool(strategy_mode)
+        (flags,) = read('<B')
+        for bit, name in enumerate(game.special_rules):
+            game.special_rules[name] = bool(flags & (1 << bit))
+        game.points = list(read('<4i'))
+        game.round_wins = list(read('<4i'))
+        game.highest_score = list(read('<4i'))
+        game.game_statistics = dict(zip(game.game_statistics, read(f'<{len(game.game_statistics)}I')))
+        game.special_hand_counts = dict(zip(game.special_hand_counts, read(f'<{len(game.special_hand_counts)}I')))
+        game.set_strategies(read_ids().decode().split(','))
+        game.seed = read_ids().decode()
+        (game.deals,) = read('<I')
+        cursor, tail, dead_wall_size = read('<HHH')
+        game.wall = Wall(read_tiles(), dead_wall_size, cursor, tail)
+        game.reset_wall_statistics()
+        game.players = [[] for _ in range(4)]
+        game.hand_counts = [bytearray(NUM_TILE_TYPES) for _ in range(4)]
+        for seat in range(4):
+            for tile in read_tiles():
+                game.add_tile_to_hand(seat, tile)
+            game.melds[seat] = [[tile] * 3 for tile in read_tiles()]
+            game.kongs[seat] = [[tile] * 4 for tile in read_tiles()]
+            game.flowers_in_hand[seat] = read_tiles()
+        game.discarded_tiles = read_tiles()
+        seats = read_ids()
+        game.turn_history = TurnHistory(zip(seats, read_tiles()))
+        game.winning_tiles = read_tiles()
+        for tile in game.discarded_tiles:
+            game.visible_counts[tile.id] += 1
+        for seat in range(4):
+            for meld in game.melds[seat] + game.kongs[seat]:
+                game.visible_counts[meld[0].id] += len(meld)
+        return game
+
+    def rebuild_danger_index(self):
+        self.danger_index = DangerIndex()
+        if self.discarded_tiles:
+            for seat, tile in self.turn_history[-len(self.discarded_tiles):]:
+                self.danger_index.discard(seat, tile.id)
+        for seat in range(4):
+            for meld in self.melds[seat] + self.kongs[seat]:
+                self.danger_index.expose(seat, meld[0].id, len(meld))
+
+    def save_game_state(self, path="game_state.bin"):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+        if self.journal is not None:
+            self.journal.flush()
+        self.event_log.info(events.GAME_SAVED, path)
+        self.event_log.flush()
+        return path
+
+    @classmethod
+    def load_game_state(cls, path="game_state.bin", headless=False):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read(), headless)
 
 if __name__ == "__main__":
     game = Mahjong()
@@ -0,0 +1,158 @@
+import math
+import random
+import time
+
+from efficiency import default_evaluator
+from game_state import GameState
+from shanten import HONOR_START, NUM_TILE_TYPES
+
+def observe(state, seat):
+    return (
+        seat,
+        tuple(state.hands[seat]),
+        tuple(sum(hand) for hand in state.hands),
+        tuple(tuple(melds) for melds in state.melds),
+        tuple(tuple(kongs) for kongs in state.kongs),
+        tuple(state.flowers),
+        tuple(state.visible),
+        len(state.wall) - 4 * NUM_TILE_TYPES,
+        state.dead_wall_size,
+        state.current_player,
+        state.turn_count,
+    )
+
+def sample_state(observation, rng):
+    (seat, own_hand, hand_sizes, melds, kongs, flowers, visible,
+     bonus_total, dead_wall_size, current_player, turn_count) = observation
+    pool = []
+    for tile_id in range(NUM_TILE_TYPES):
+        pool.extend([tile_id] * (4 - visible[tile_id] - own_hand[tile_id]))
+    rng.shuffle(pool)
+    hands = []
+    offset = 0
+    for other in range(4):
+        if other == seat:
+            hands.append(list(own_hand))
+            continue
+        hand = [0] * NUM_TILE_TYPES
+        for tile_id in pool[offset:offset + hand_sizes[other]]:
+            hand[tile_id] += 1
+        hands.append(hand)
+        offset += hand_sizes[other]
+    wall = pool[offset:] + [NUM_TILE_TYPES] * (bonus_total - sum(flowers))
+    rng.shuffle(wall)
+    return GameState(wall, dead_wall_size=dead_wall_size, hands=hands,
+                     melds=[list(seat_melds) for seat_melds in melds], kongs=[list(seat_kongs) for seat_kongs in kongs],
+                     flowers=list(flowers), visible=list(visible), current_player=current_player, turn_count=turn_count)
+
+def quick_discard(hand):
+    best_tile = None
+    best_score = None
+    for tile_id in range(NUM_TILE_TYPES):
+        count = hand[tile_id]
+        if not count:
+            continue
+        score = 4 * (count - 1)
+        if tile_id < HONOR_START:
+            rank = tile_id % 9
+            if rank > 0:
+                score += 2 * hand[tile_id - 1]
+            if rank < 8:
+                score += 2 * hand[tile_id + 1]
+            if rank > 1:
+                score += hand[tile_id - 2]
+            if rank < 7:
+                score += hand[tile_id + 2]
+        else:
+            score -= 1
+        if best_score is None or score < best_score:
+            best_score = score
+            best_tile = tile_id
+    return best_tile
+
+def rollout(state):
+    while True:
+        tile_id = state.draw()
+        if tile_id is None:
+            return None
+        player = state.current_player
+        if state.is_win(player):
+            return player
+        state.discard(quick_discard(state.hands[player]))
+
+def run_rollouts(observation, discard, count, seed):
+    rng = random.Random(seed)
+    seat = observation[0]
+    wins = 0
+    for _ in range(count):
+        state = sample_state(observation, rng)
+        state.discard(discard)
+        if rollout(state) == seat:
+            wins += 1
+    return wins
+
+class MonteCarloPlanner:
+    def __init__(self, time_budget=0.05, rollout_budget=400, batch_size=16, max_candidates=4,
+                 confidence=2.0, min_rollouts=32, executor=None, seed=None):
+        self.time_budget = time_budget
+        self.rollout_budget = rollout_budget
+        self.batch_size = batch_size
+        self.max_candidates = max_candidates
+        self.confidence = confidence
+        self.min_rollouts = min_rollouts
+        self.executor = executor
+        self.rng = random.Random(seed)
+        self.evaluator = default_evaluator
+        self.last_search = None
+
+    def candidates(self, state, seat):
+        hand = state.hands[seat]
+        ranked = self.evaluator.rank_discards(hand, state.unseen_counts(seat), state.exposed_sets(seat))
+        if not ranked:
+            return []
+        best_shanten = ranked[0][1]
+        return [discard for discard, current, _ in ranked if current <= best_shanten + 1][:self.max_candidates]
+
+    def bounds(self, wins, rollouts):
+        mean = (wins + 1) / (rollouts + 2)
+        margin = self.confidence * math.sqrt(mean * (1 - mean) / (rollouts + 2))
+        return mean - margin, mean + margin
+
+    def run_batch(self, observation, discards, size):
+        jobs = [(discard, self.rng.getrandbits(32)) for discard in discards]
+        if self.executor is None:
+            return [(discard, run_rollouts(observation, discard, size, seed)) for discard, seed in jobs]
+        futures = [(discard, self.executor.submit(run_rollouts, observation, discard, size, seed))
+                   for discard, seed in jobs]
+        return [(discard, future.result()) for discard, future in futures]
+
+    def choose_discard(self, state, seat):
+        candidates = self.candidates(state, seat)
+        if len(candidates) <= 1:
+            self.last_search = {"rollouts": 0, "elapsed": 0.0, "results": {}}
+            return candidates[0] if candidates else None
+        observation = observe(state, seat)
+        wins = {discard: 0 for discard in candidates}
+        rollouts = {discard: 0 for discard in candidates}
+        alive = list(candidates)
+        deadline = time.perf_counter() + self.time_budget
+        total = 0
+        while len(alive) > 1 and time.perf_counter() < deadline:
+            size = min(self.batch_size, (self.rollout_budget - total) // len(alive))
+            if size <= 0:
+                break
+            for discard, batch_wins in self.run_batch(observation, alive, size):
+                wins[discard] += batch_wins
+                rollouts[discard] += size
+                total += size
+            if min(rollouts[discard] for discard in alive) >= self.min_rollouts:
+                bounds = {discard: self.bounds(wins[discard], rollouts[discard]) for discard in alive}
+                best_low = max(low for low, _ in bounds.values())
+                alive = [discard for discard in alive if bounds[discard][1] >= best_low]
+        best = max(alive, key=lambda discard: (wins[discard] + 1) / (rollouts[discard] + 2))
+        self.last_search = {
+            "rollouts": total,
+            "elapsed": self.time_budget - (deadline - time.perf_counter()),
+            "results": {discard: (wins[discard], rollouts[discard]) for discard in candidates},
+        }
+        return best
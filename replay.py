@@ -0,0 +1,180 @@
+import argparse
+import bisect
+import struct
+import time
+import zlib
+
+from main import TILES, Mahjong
+
+REPLAY_MAGIC = b'MJRP'
+REPLAY_VERSION = 1
+HEADER = struct.Struct('<4sH')
+SUMMARY = struct.Struct('<IIII')
+
+INT_SEED = 0
+STR_SEED = 1
+
+def state_checksum(game):
+    return zlib.crc32(game.to_bytes())
+
+class GameRecord:
+    def __init__(self, seed, strategies, max_rounds, decisions, turns, checksum=None):
+        self.seed = seed
+        self.strategies = list(strategies)
+        self.max_rounds = max_rounds
+        self.decisions = bytes(decisions)
+        self.turns = turns
+        self.checksum = checksum
+
+    @classmethod
+    def from_game(cls, game):
+        if game.decisions is None:
+            raise ValueError("Only games that called record_decisions() before dealing can be replayed")
+        return cls(game.seed, game.strategy_names(), game.max_rounds, game.decisions,
+                   game.game_statistics['turns'], state_checksum(game))
+
+    def to_bytes(self):
+        out = bytearray(HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION))
+        seed = str(self.seed).encode()
+        names = ','.join(self.strategies).encode()
+        out.extend(struct.pack('<BH', INT_SEED if isinstance(self.seed, int) else STR_SEED, len(seed)))
+        out.extend(seed)
+        out.extend(struct.pack('<H', len(names)))
+        out.extend(names)
+        out.extend(SUMMARY.pack(self.max_rounds, self.turns, self.checksum or 0, len(self.decisions)))
+        out.extend(self.decisions)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version = HEADER.unpack_from(data, 0)
+        if magic != REPLAY_MAGIC:
+            raise ValueError("Not a Mahjong replay")
+        if version != REPLAY_VERSION:
+            raise ValueError(f"Unsupported replay version {version}")
+        offset = HEADER.size
+        kind, length = struct.unpack_from('<BH', data, offset)
+        offset += 3
+        seed = data[offset:offset + length].decode()
+        offset += length
+        (length,) = struct.unpack_from('<H', data, offset)
+        offset += 2
+        names = data[offset:offset + length].decode().split(',')
+        offset += length
+        max_rounds, turns, checksum, count = SUMMARY.unpack_from(data, offset)
+        offset += SUMMARY.size
+        return cls(int(seed) if kind == INT_SEED else seed, names, max_rounds,
+                   data[offset:offset + count], turns, checksum or None)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+class ReplayEngine:
+    def __init__(self, record, checkpoint_interval=256):
+        self.record = record
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_turns = []
+        self.checkpoints = []
+        self.game = None
+        self.decision_index = 0
+        self.restart()
+
+    @property
+    def turn(self):
+        return self.game.game_statistics['turns']
+
+    def is_finished(self):
+        return self.turn >= self.record.turns or self.game.rounds_played >= self.game.max_rounds
+
+    def attach(self, game, decision_index):
+        game.decision_source = self.next_decision
+        self.game = game
+        self.decision_index = decision_index
+
+    def next_decision(self):
+        tile_id = self.record.decisions[self.decision_index]
+        self.decision_index += 1
+        return TILES[tile_id]
+
+    def restart(self):
+        game = Mahjong(seed=self.record.seed, headless=True)
+        game.max_rounds = self.record.max_rounds
+        game.set_strategies(self.record.strategies)
+        game.deal_hand()
+        game.activate_strategy_mode()
+        self.attach(game, 0)
+        self.checkpoint()
+
+    def checkpoint(self):
+        turn = self.turn
+        index = bisect.bisect_left(self.checkpoint_turns, turn)
+        if index == len(self.checkpoint_turns) or self.checkpoint_turns[index] != turn:
+            self.checkpoint_turns.insert(index, turn)
+            self.checkpoints.insert(index, (self.decision_index, self.game.to_bytes()))
+
+    def restore(self, index):
+        decision_index, data = self.checkpoints[index]
+        self.attach(Mahjong.from_bytes(data, headless=True), decision_index)
+
+    def step(self):
+        if self.is_finished():
+            return False
+        game = self.game
+        game.finish_turn(game.play_turn())
+        if self.turn % self.checkpoint_interval == 0:
+            self.checkpoint()
+        return True
+
+    def seek(self, turn):
+        index = bisect.bisect_right(self.checkpoint_turns, turn) - 1
+        if turn < self.turn or self.checkpoint_turns[index] > self.turn:
+            self.restore(index)
+        while self.turn < turn and self.step():
+            pass
+        return self.game
+
+    def run(self):
+        while self.step():
+            pass
+        return self.game
+
+    def verify(self):
+        game = self.run()
+        return self.record.checksum is None or state_checksum(game) == self.record.checksum
+
+def record_game(seed, strategies, max_rounds=4):
+    game = Mahjong(seed=seed, headless=True)
+    game.max_rounds = max_rounds
+    game.set_strategies(strategies)
+    game.record_decisions()
+    game.play_game()
+    return GameRecord.from_game(game)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded Mahjong game.")
+    parser.add_argument("record", help="Replay file written by GameRecord.save")
+    parser.add_argument("--turn", type=int, help="Seek to this turn and print the game state")
+    parser.add_argument("--interval", type=int, default=256, help="Turns between in-memory checkpoints")
+    args = parser.parse_args()
+    record = GameRecord.load(args.record)
+    engine = ReplayEngine(record, args.interval)
+    start = time.perf_counter()
+    if args.turn is None:
+        ok = engine.verify()
+        print(f"Replayed {engine.turn} turns in {time.perf_counter() - start:.3f}s, checksum {'ok' if ok else 'MISMATCH'}")
+    else:
+        game = engine.seek(args.turn)
+        print(f"Turn {engine.turn} reached in {time.perf_counter() - start:.3f}s")
+        for seat in range(4):
+            print(f"Player {seat + 1}: {game.show_hand(seat)}")
+        print("Points:", game.points)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+from collections import namedtuple
+
+from shanten import HONOR_START, NUM_TILE_TYPES, TERMINAL_HONOR_IDS
+
+SUIT_MASKS = tuple(((1 << 9) - 1) << (9 * suit) for suit in range(3))
+HONOR_MASK = ((1 << (NUM_TILE_TYPES - HONOR_START)) - 1) << HONOR_START
+TERMINAL_HONOR_MASK = sum(1 << tile_id for tile_id in TERMINAL_HONOR_IDS)
+
+HEAVENLY_HAND = 'heavenly_hand'
+EARTHLY_HAND = 'earthly_hand'
+
+HandProfile = namedtuple('HandProfile', 'present singles pairs triplets quads melds kongs flowers flags')
+Pattern = namedtuple('Pattern', 'name points test')
+Score = namedtuple('Score', 'points patterns')
+
+def single_bit(mask):
+    return mask != 0 and mask & (mask - 1) == 0
+
+def one_suit(mask):
+    return any(mask & ~suit_mask == 0 for suit_mask in SUIT_MASKS)
+
+def is_thirteen_orphans(hand):
+    return (not hand.melds and not hand.kongs and hand.present == TERMINAL_HONOR_MASK
+            and not hand.triplets and not hand.quads and single_bit(hand.pairs))
+
+def is_seven_pairs(hand):
+    return (not hand.melds and not hand.kongs and not hand.singles and not hand.triplets
+            and not hand.quads and bin(hand.pairs).count('1') == 7)
+
+def is_all_pongs(hand):
+    return not hand.singles and not hand.quads and single_bit(hand.pairs)
+
+def is_pure_flush(hand):
+    return hand.present != 0 and one_suit(hand.present)
+
+def is_half_flush(hand):
+    suited = hand.present & ~HONOR_MASK
+    return suited != 0 and hand.present & HONOR_MASK != 0 and one_suit(suited)
+
+def is_all_honors(hand):
+    return hand.present != 0 and hand.present & ~HONOR_MASK == 0
+
+PATTERNS = (
+    Pattern('melds', 2, lambda hand: len(hand.melds)),
+    Pattern('kongs', 8, lambda hand: len(hand.kongs)),
+    Pattern('flowers', 4, lambda hand: hand.flowers),
+    Pattern(HEAVENLY_HAND, 100, lambda hand: HEAVENLY_HAND in hand.flags),
+    Pattern(EARTHLY_HAND, 50, lambda hand: EARTHLY_HAND in hand.flags),
+    Pattern('thirteen_orphans', 200, is_thirteen_orphans),
+    Pattern('seven_pairs', 25, is_seven_pairs),
+    Pattern('all_pongs', 30, is_all_pongs),
+    Pattern('pure_flush', 70, is_pure_flush),
+    Pattern('half_flush', 30, is_half_flush),
+    Pattern('all_honors', 100, is_all_honors),
+)
+
+def profile(counts, melds=(), kongs=(), flowers=0, flags=frozenset()):
+    present = singles = pairs = triplets = quads = 0
+    bit = 1
+    for count in counts:
+        if count:
+            present |= bit
+            if count == 1:
+                singles |= bit
+            elif count == 2:
+                pairs |= bit
+            elif count == 3:
+                triplets |= bit
+            else:
+                quads |= bit
+        bit <<= 1
+    for tile_id in melds:
+        present |= 1 << tile_id
+    for tile_id in kongs:
+        present |= 1 << tile_id
+    return HandProfile(present, singles, pairs, triplets, quads, tuple(melds), tuple(kongs), flowers, frozenset(flags))
+
+def score_profile(hand, patterns=PATTERNS):
+    points = 0
+    matched = []
+    for pattern in patterns:
+        times = pattern.test(hand)
+        if times:
+            points += pattern.points * times
+            matched.append(pattern.name)
+    return Score(points, tuple(matched))
+
+def score_hand(counts, melds=(), kongs=(), flowers=0, flags=frozenset(), patterns=PATTERNS):
+    return score_profile(profile(counts, melds, kongs, flowers, flags), patterns)
+
+def score_hands(hands, patterns=PATTERNS):
+    scores = []
+    seen = {}
+    for counts, melds, kongs, flowers, flags in hands:
+        key = (tuple(counts), tuple(melds), tuple(kongs), flowers, frozenset(flags))
+        score = seen.get(key)
+        if score is None:
+            score = seen[key] = score_profile(profile(*key), patterns)
+        scores.append(score)
+    return scores
@@ -0,0 +1,475 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import PhaseStats
+from main import NUM_TILE_TYPES, Mahjong
+from monte_carlo import quick_discard
+from simulation import add_planner_arguments, planner_settings
+
+FRAME = struct.Struct('<HB')
+JOIN_FORMAT = struct.Struct('<IB')
+SEATED_FORMAT = struct.Struct('<IB')
+TURN_FORMAT = struct.Struct('<HHB')
+DISCARDED_FORMAT = struct.Struct('<BB')
+WIN_FORMAT = struct.Struct('<BBI')
+POINTS_FORMAT = struct.Struct('<4i')
+
+ANY_TABLE = 0xFFFFFFFF
+ANY_SEAT = 0xFF
+
+JOIN = 1
+DISCARD = 2
+LEAVE = 3
+
+SEATED = 16
+TURN = 17
+DISCARDED = 18
+WIN = 19
+ROUND_DRAWN = 20
+GAME_OVER = 21
+ERROR = 22
+
+BAD_MESSAGE = 1
+SEAT_TAKEN = 2
+TABLE_STARTED = 3
+SERVER_FULL = 4
+INVALID_DISCARD = 5
+TURN_TIMEOUT = 6
+SEAT_RELEASED = 7
+
+OFFLOADED_STRATEGIES = ('monte_carlo',)
+
+def encode(message_type, payload=b''):
+    return FRAME.pack(len(payload), message_type) + payload
+
+async def read_frame(reader):
+    length, message_type = FRAME.unpack(await reader.readexactly(FRAME.size))
+    payload = await reader.readexactly(length) if length else b''
+    return message_type, payload
+
+class Connection:
+    def __init__(self, reader, writer, queue_size=256, drain_timeout=5.0):
+        self.reader = reader
+        self.writer = writer
+        self.outbox = asyncio.Queue(queue_size)
+        self.drain_timeout = drain_timeout
+        self.seats = []
+        self.closed = False
+        self.writer_task = asyncio.create_task(self.write_loop())
+
+    def send(self, message_type, payload=b''):
+        if self.closed:
+            return
+        try:
+            self.outbox.put_nowait(encode(message_type, payload))
+        except asyncio.QueueFull:
+            self.close()
+
+    async def write_loop(self):
+        try:
+            while True:
+                self.writer.write(await self.outbox.get())
+                while not self.outbox.empty():
+                    self.writer.write(self.outbox.get_nowait())
+                await asyncio.wait_for(self.writer.drain(), self.drain_timeout)
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            self.close()
+
+    def release_seats(self):
+        for table, seat in self.seats:
+            table.release(seat)
+        self.seats.clear()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.release_seats()
+        if self.writer_task is not asyncio.current_task():
+            self.writer_task.cancel()
+        self.writer.close()
+
+class Table:
+    def __init__(self, server, table_id):
+        self.server = server
+        self.table_id = table_id
+        self.game = Mahjong(seed=f"{server.seed}:{table_id}", headless=True, planner_settings=server.planner_settings)
+        self.game.max_rounds = server.max_rounds
+        if server.strategies is not None:
+            self.game.set_strategies(server.strategies)
+        names = self.game.strategy_names()
+        self.offloaded = [names[seat % len(names)] in server.offload for seat in range(4)]
+        self.clients = [None] * 4
+        self.pending = [None] * 4
+        self.timeouts = [0] * 4
+        self.started = False
+        self.task = None
+
+    def free_seat(self):
+        for seat, client in enumerate(self.clients):
+            if client is None:
+                return seat
+        return None
+
+    def claim(self, connection, seat):
+        self.clients[seat] = connection
+        connection.seats.append((self, seat))
+
+    def release(self, seat):
+        self.clients[seat] = None
+        future = self.pending[seat]
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    def evict(self, seat):
+        connection = self.clients[seat]
+        if connection is None:
+            return
+        if (self, seat) in connection.seats:
+            connection.seats.remove((self, seat))
+        self.release(seat)
+        connection.send(ERROR, bytes([SEAT_RELEASED]))
+
+    def broadcast(self, message_type, payload=b''):
+        for client in self.clients:
+            if client is not None:
+                client.send(message_type, payload)
+
+    def accept_discard(self, connection, seat, tile_id):
+        future = self.pending[seat]
+        if future is None or future.done():
+            return False
+        if any(tile.id == tile_id for tile in self.game.players[seat]):
+            future.set_result(tile_id)
+        else:
+            connection.send(ERROR, bytes([INVALID_DISCARD]))
+            future.set_result(None)
+        return True
+
+    async def remote_discard(self, client, seat):
+        hand = self.game.players[seat]
+        future = self.pending[seat] = asyncio.get_running_loop().create_future()
+        timeout_ms = min(0xFFFF, int(self.server.turn_timeout * 1000))
+        client.send(TURN, TURN_FORMAT.pack(self.game.turn_count & 0xFFFF, timeout_ms, hand[-1].id)
+                    + bytes(tile.id for tile in hand))
+        try:
+            tile_id = await asyncio.wait_for(future, self.server.turn_timeout)
+        except asyncio.TimeoutError:
+            client.send(ERROR, bytes([TURN_TIMEOUT]))
+            self.timeouts[seat] += 1
+            if self.timeouts[seat] >= self.server.max_timeouts:
+                self.evict(seat)
+            return None
+        finally:
+            self.pending[seat] = None
+        self.timeouts[seat] = 0
+        for tile in hand:
+            if tile.id == tile_id:
+                return tile
+        return None
+
+    async def decide(self, seat):
+        client = self.clients[seat]
+        waited = 0.0
+        if client is not None:
+            start = time.perf_counter()
+            tile = await self.remote_discard(client, seat)
+            waited = time.perf_counter() - start
+            self.server.client_latency.record(waited)
+            if tile is not None:
+                return tile, waited
+        if self.offloaded[seat]:
+            tile = await asyncio.get_running_loop().run_in_executor(self.server.executor, self.game.choose_discard)
+            return tile, waited
+        return self.game.choose_discard(), waited
+
+    async def run(self):
+        try:
+            await self.play()
+        finally:
+            self.server.finish(self)
+
+    async def play(self):
+        await asyncio.sleep(self.server.lobby_delay)
+        self.started = True
+        game = self.game
+        latency = self.server.turn_latency
+        timer = time.perf_counter
+        if not any(game.players):
+            game.deal_hand()
+        game.activate_strategy_mode()
+        while game.rounds_played < game.max_rounds:
+            start = timer()
+            seat = game.current_player
+            win = False
+            waited = 0.0
+            if game.draw_turn_tile():
+                win = game.settle_win()
+                if win:
+                    self.broadcast(WIN, WIN_FORMAT.pack(seat, game.winning_tiles[-1].id, game.last_score.points))
+                else:
+                    tile, waited = await self.decide(seat)
+                    game.discard_tile(tile)
+                    self.broadcast(DISCARDED, DISCARDED_FORMAT.pack(seat, tile.id))
+                game.advance_turn()
+            latency.record(timer() - start - waited)
+            self.server.turns += 1
+            if game.finish_turn(win):
+                if not win:
+                    self.broadcast(ROUND_DRAWN)
+            else:
+                await asyncio.sleep(0)
+        self.broadcast(GAME_OVER, POINTS_FORMAT.pack(*game.points))
+
+class MahjongServer:
+    def __init__(self, seed=0, strategies=None, max_rounds=1, turn_timeout=5.0, lobby_delay=0.0, max_tables=10000,
+                 queue_size=256, drain_timeout=5.0, executor=None, offload=OFFLOADED_STRATEGIES, planner_settings=None,
+                 max_timeouts=1):
+        self.seed = seed
+        self.max_timeouts = max_timeouts
+        self.planner_settings = planner_settings
+        self.strategies = strategies
+        self.max_rounds = max_rounds
+        self.turn_timeout = turn_timeout
+        self.lobby_delay = lobby_delay
+        self.max_tables = max_tables
+        self.queue_size = queue_size
+        self.drain_timeout = drain_timeout
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1))
+        self.offload = set(offload)
+        self.tables = {}
+        self.connections = set()
+        self.table_ids = itertools.count(1)
+        self.finished_tables = 0
+        self.turns = 0
+        self.turn_latency = PhaseStats()
+        self.client_latency = PhaseStats()
+        self.listener = None
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        if path is not None:
+            self.listener = await asyncio.start_unix_server(self.handle, path=path)
+        else:
+            self.listener = await asyncio.start_server(self.handle, host, port)
+        return self
+
+    @property
+    def address(self):
+        return self.listener.sockets[0].getsockname()
+
+    def create_table(self, table_id=None):
+        if len(self.tables) >= self.max_tables:
+            return None
+        if table_id is None:
+            table_id = next(self.table_ids)
+            while table_id in self.tables:
+                table_id = next(self.table_ids)
+        table = self.tables[table_id] = Table(self, table_id)
+        table.task = asyncio.create_task(table.run())
+        self.idle.clear()
+        return table
+
+    def finish(self, table):
+        del self.tables[table.table_id]
+        self.finished_tables += 1
+        if not self.tables:
+            self.idle.set()
+
+    def forming_table(self):
+        for table in self.tables.values():
+            if not table.started and table.free_seat() is not None:
+                return table
+        return self.create_table()
+
+    def join(self, connection, table_id, seat):
+        if table_id == ANY_TABLE:
+            table = self.forming_table()
+        else:
+            table = self.tables.get(table_id) or self.create_table(table_id)
+        if table is None:
+            return connection.send(ERROR, bytes([SERVER_FULL]))
+        if table.started:
+            return connection.send(ERROR, bytes([TABLE_STARTED]))
+        if seat == ANY_SEAT:
+            seat = table.free_seat()
+        if seat is None or seat >= 4 or table.clients[seat] is not None:
+            return connection.send(ERROR, bytes([SEAT_TAKEN]))
+        table.claim(connection, seat)
+        connection.send(SEATED, SEATED_FORMAT.pack(table.table_id, seat))
+
+    def dispatch(self, connection, message_type, payload):
+        if message_type == DISCARD and len(payload) == 1:
+            for table, seat in connection.seats:
+                if table.accept_discard(connection, seat, payload[0]):
+                    return
+        elif message_type == JOIN and len(payload) == JOIN_FORMAT.size:
+            self.join(connection, *JOIN_FORMAT.unpack(payload))
+        elif message_type == LEAVE:
+            connection.release_seats()
+        else:
+            connection.send(ERROR, bytes([BAD_MESSAGE]))
+
+    async def handle(self, reader, writer):
+        connection = Connection(reader, writer, self.queue_size, self.drain_timeout)
+        self.connections.add(connection)
+        try:
+            while not connection.closed:
+                message_type, payload = await read_frame(reader)
+                self.dispatch(connection, message_type, payload)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            connection.close()
+            self.connections.discard(connection)
+
+    async def wait_idle(self):
+        await self.idle.wait()
+
+    def stats(self):
+        return {
+            "tables": len(self.tables),
+            "finished_tables": self.finished_tables,
+            "turns": self.turns,
+            "turn_latency": self.turn_latency.snapshot(),
+            "client_latency": self.client_latency.snapshot(),
+        }
+
+    async def close(self):
+        if self.listener is not None:
+            self.listener.close()
+            await self.listener.wait_closed()
+        for table in list(self.tables.values()):
+            table.task.cancel()
+        for connection in list(self.connections):
+            connection.close()
+        await asyncio.sleep(0)
+        if self.owns_executor:
+            self.executor.shutdown(wait=False)
+
+def default_decide(hand, drawn):
+    counts = [0] * NUM_TILE_TYPES
+    for tile_id in hand:
+        if tile_id < NUM_TILE_TYPES:
+            counts[tile_id] += 1
+    tile_id = quick_discard(counts)
+    return drawn if tile_id is None else tile_id
+
+class MahjongClient:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.errors = []
+        self.table_id = None
+        self.seat = None
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=None, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    def send(self, message_type, payload=b''):
+        self.writer.write(encode(message_type, payload))
+
+    async def join(self, table_id=ANY_TABLE, seat=ANY_SEAT):
+        self.send(JOIN, JOIN_FORMAT.pack(table_id, seat))
+        await self.writer.drain()
+        message_type, payload = await read_frame(self.reader)
+        if message_type == ERROR:
+            raise ConnectionError(f"join refused with error {payload[0]}")
+        self.table_id, self.seat = SEATED_FORMAT.unpack(payload)
+        return self.table_id, self.seat
+
+    async def play(self, decide=default_decide):
+        while True:
+            message_type, payload = await read_frame(self.reader)
+            if message_type == TURN:
+                _, _, drawn = TURN_FORMAT.unpack_from(payload)
+                self.send(DISCARD, bytes([decide(list(payload[TURN_FORMAT.size:]), drawn)]))
+                await self.writer.drain()
+            elif message_type == GAME_OVER:
+                return POINTS_FORMAT.unpack(payload)
+            elif message_type == ERROR:
+                self.errors.append(payload[0])
+                if payload[0] == SEAT_RELEASED:
+                    return None
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+async def run_load(tables, clients, seed=0, max_rounds=1, strategies=None):
+    server = await MahjongServer(seed=seed, strategies=strategies, max_rounds=max_rounds).start()
+    host, port = server.address[:2]
+    start = time.perf_counter()
+
+    async def remote_player():
+        client = await MahjongClient.connect(host, port)
+        await client.join()
+        points = await client.play()
+        await client.close()
+        return points
+
+    players = [asyncio.create_task(remote_player()) for _ in range(clients)]
+    await asyncio.sleep(0)
+    for _ in range(tables):
+        server.create_table()
+    await asyncio.gather(*players)
+    await server.wait_idle()
+    elapsed = time.perf_counter() - start
+    stats = server.stats()
+    await server.close()
+    stats["elapsed"] = elapsed
+    stats["tables_per_sec"] = stats["finished_tables"] / elapsed
+    stats["turns_per_sec"] = stats["turns"] / elapsed
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Host Mahjong tables over a local socket.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve = subparsers.add_parser("serve", help="Run the table server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--unix", help="Listen on this Unix socket path instead of TCP")
+    serve.add_argument("--seed", type=int, default=0)
+    serve.add_argument("--rounds", type=int, default=1)
+    serve.add_argument("--turn-timeout", type=float, default=5.0)
+    serve.add_argument("--max-timeouts", type=int, default=1, help="Missed turns before a seat goes to the bot")
+    serve.add_argument("--lobby-delay", type=float, default=1.0)
+    serve.add_argument("--max-tables", type=int, default=10000)
+    add_planner_arguments(serve)
+    load = subparsers.add_parser("load", help="Run bot tables and socket clients against an in-process server")
+    load.add_argument("--tables", type=int, default=1000)
+    load.add_argument("--clients", type=int, default=100)
+    load.add_argument("--seed", type=int, default=0)
+    load.add_argument("--rounds", type=int, default=1)
+    args = parser.parse_args()
+    if args.command == "load":
+        print(json.dumps(asyncio.run(run_load(args.tables, args.clients, args.seed, args.rounds)), indent=2))
+        return
+
+    async def serve_forever():
+        server = MahjongServer(seed=args.seed, max_rounds=args.rounds, turn_timeout=args.turn_timeout,
+                               lobby_delay=args.lobby_delay, max_tables=args.max_tables, max_timeouts=args.max_timeouts,
+                               planner_settings=planner_settings(args))
+        await server.start(args.host, args.port, args.unix)
+        print(f"Serving Mahjong tables on {args.unix or server.address}")
+        await server.listener.serve_forever()
+
+    asyncio.run(serve_forever())
+
+if __name__ == "__main__":
+    main()
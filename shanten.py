@@ -0,0 +1,212 @@
+from functools import lru_cache
+
+NUM_TILE_TYPES = 34
+SUIT_RANGES = [(0, 9), (9, 18), (18, 27)]
+HONOR_START = 27
+TERMINAL_HONOR_IDS = [0, 8, 9, 17, 18, 26] + list(range(HONOR_START, NUM_TILE_TYPES))
+
+def _strip(pattern):
+    start = 0
+    end = len(pattern)
+    while start < end and not pattern[start]:
+        start += 1
+    while end > start and not pattern[end - 1]:
+        end -= 1
+    return pattern[start:end]
+
+def _take(pattern, offsets, amount=1):
+    counts = list(pattern)
+    for offset in offsets:
+        counts[offset] -= amount
+    return _strip(tuple(counts))
+
+def _prune(options):
+    kept = []
+    for option in sorted(options, reverse=True):
+        m, t, p = option
+        if not any(km >= m and kt >= t and kp >= p for km, kt, kp in kept):
+            kept.append(option)
+    return tuple(kept)
+
+@lru_cache(maxsize=None)
+def _decompositions(pattern, suited):
+    if not pattern:
+        return ((0, 0, 0),)
+    options = set()
+
+    def extend(sub, dm, dt, dp):
+        for m, t, p in _decompositions(sub, suited):
+            if p + dp <= 1:
+                options.add((m + dm, t + dt, p + dp))
+
+    first = pattern[0]
+    if first >= 3:
+        extend(_take(pattern, [0], 3), 1, 0, 0)
+    if first >= 2:
+        sub = _take(pattern, [0], 2)
+        extend(sub, 0, 0, 1)
+        extend(sub, 0, 1, 0)
+    if suited and len(pattern) >= 2 and pattern[1]:
+        if len(pattern) >= 3 and pattern[2]:
+            extend(_take(pattern, [0, 1, 2]), 1, 0, 0)
+        extend(_take(pattern, [0, 1]), 0, 1, 0)
+    if suited and len(pattern) >= 3 and pattern[2]:
+        extend(_take(pattern, [0, 2]), 0, 1, 0)
+    extend(_take(pattern, [0]), 0, 0, 0)
+    return _prune(options)
+
+_option_sets = []
+_option_ids = {}
+
+def _intern(options):
+    option_id = _option_ids.get(options)
+    if option_id is None:
+        option_id = len(_option_sets)
+        _option_sets.append(options)
+        _option_ids[options] = option_id
+    return option_id
+
+@lru_cache(maxsize=None)
+def _suit_options(pattern):
+    return _intern(_decompositions(_strip(pattern), True))
+
+@lru_cache(maxsize=None)
+def _honor_options(pattern):
+    return _intern(_decompositions(tuple(sorted((count for count in pattern if count), reverse=True)), False))
+
+@lru_cache(maxsize=None)
+def _completions(pattern, suited):
+    if not pattern:
+        return 1
+    result = 0
+    first = pattern[0]
+    if first >= 3:
+        result |= _completions(_take(pattern, [0], 3), suited)
+    if suited and len(pattern) >= 3 and pattern[1] and pattern[2]:
+        result |= _completions(_take(pattern, [0, 1, 2]), suited)
+    if first >= 2 and _completions(_take(pattern, [0], 2), suited) & 1:
+        result |= 2
+    return result
+
+@lru_cache(maxsize=None)
+def _merge(left, right):
+    merged = set()
+    for lm, lt, lp in _option_sets[left]:
+        for rm, rt, rp in _option_sets[right]:
+            if lp + rp <= 1:
+                merged.add((lm + rm, min(lt + rt, 4), lp + rp))
+    return _intern(_prune(merged))
+
+@lru_cache(maxsize=None)
+def _exposed_options(exposed):
+    return _intern(((exposed, 0, 0),))
+
+@lru_cache(maxsize=None)
+def _standard_value(option_id):
+    best = 0
+    for m, t, p in _option_sets[option_id]:
+        m = min(m, 4)
+        value = 2 * m + min(t, 4 - m) + p
+        if value > best:
+            best = value
+    return 8 - best
+
+def pattern_options(pattern, group):
+    if group < 3:
+        return _suit_options(pattern)
+    return _honor_options(pattern)
+
+def group_options(counts, group):
+    if group < 3:
+        return _suit_options(tuple(counts[group * 9:group * 9 + 9]))
+    return _honor_options(tuple(counts[HONOR_START:NUM_TILE_TYPES]))
+
+def combine_groups(groups, exposed=0):
+    options = _exposed_options(exposed)
+    for group in groups:
+        options = _merge(options, group)
+    return options
+
+def shanten_from_groups(groups, exposed=0):
+    return _standard_value(combine_groups(groups, exposed))
+
+def shanten_with_group(options, group):
+    return _standard_value(_merge(options, group))
+
+def standard_shanten(counts, exposed=0):
+    return shanten_from_groups([group_options(counts, group) for group in range(4)], exposed)
+
+def seven_pairs_shanten(counts):
+    kinds = len(counts) - counts.count(0)
+    pairs = kinds - counts.count(1)
+    return 6 - pairs + max(0, 7 - kinds)
+
+def thirteen_orphans_shanten(counts):
+    kinds = 0
+    has_pair = False
+    for tile_id in TERMINAL_HONOR_IDS:
+        count = counts[tile_id]
+        if count:
+            kinds += 1
+            if count >= 2:
+                has_pair = True
+    return 13 - kinds - (1 if has_pair else 0)
+
+def shanten(counts, exposed=0):
+    result = standard_shanten(counts, exposed)
+    if exposed == 0 and result > -1:
+        result = min(result, seven_pairs_shanten(counts), thirteen_orphans_shanten(counts))
+    return result
+
+def is_standard_agari(counts):
+    pairs = 1
+    for start, end in SUIT_RANGES:
+        pairs = _combine_pairs(pairs, _completions(_strip(tuple(counts[start:end])), True))
+        if not pairs:
+            return False
+    for tile_id in range(HONOR_START, NUM_TILE_TYPES):
+        count = counts[tile_id]
+        if count == 1 or count == 4:
+            return False
+        if count == 2:
+            pairs = _combine_pairs(pairs, 2)
+            if not pairs:
+                return False
+    return bool(pairs & 2)
+
+def _combine_pairs(left, right):
+    result = 0
+    if left & 1 and right & 1:
+        result |= 1
+    if (left & 1 and right & 2) or (left & 2 and right & 1):
+        result |= 2
+    return result
+
+def is_seven_pairs(counts):
+    pairs = 0
+    for count in counts:
+        if count == 2:
+            pairs += 1
+        elif count:
+            return False
+    return pairs == 7
+
+def is_thirteen_orphans(counts):
+    return sum(counts) == 14 and thirteen_orphans_shanten(counts) == -1
+
+def is_agari(counts, exposed=0):
+    if sum(counts) % 3 != 2:
+        return False
+    if is_standard_agari(counts):
+        return True
+    return exposed == 0 and (is_seven_pairs(counts) or is_thirteen_orphans(counts))
+
+def cache_info():
+    hits = misses = size = 0
+    for cached in (_decompositions, _suit_options, _honor_options, _completions, _merge, _exposed_options, _standard_value):
+        info = cached.cache_info()
+        hits += info.hits
+        misses += info.misses
+        size += info.currsize
+    lookups = hits + misses
+    return {"hits": hits, "misses": misses, "size": size, "hit_rate": hits / lookups if lookups else 0.0}
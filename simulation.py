@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from main import Mahjong
+
+DEFAULT_STRATEGIES = ['default', 'aggressive', 'defensive', 'efficiency']
+
+def empty_results():
+    return {
+        "games": 0,
+        "rounds": 0,
+        "num_draws": 0,
+        "round_wins": [0] * 4,
+        "points": [0] * 4,
+        "game_statistics": {'turns': 0, 'draws': 0, 'discards': 0, 'melds': 0, 'kongs': 0},
+        "special_hand_counts": {"all_pong": 0, "pure_triplets": 0},
+    }
+
+def game_results(game):
+    results = empty_results()
+    results["games"] = 1
+    results["rounds"] = game.rounds_played
+    results["num_draws"] = game.num_draws
+    results["round_wins"] = list(game.round_wins)
+    results["points"] = list(game.points)
+    results["game_statistics"] = dict(game.game_statistics)
+    results["special_hand_counts"] = dict(game.special_hand_counts)
+    return results
+
+def merge_results(total, results):
+    for key in ("games", "rounds", "num_draws"):
+        total[key] += results[key]
+    for key in ("round_wins", "points"):
+        total[key] = [a + b for a, b in zip(total[key], results[key])]
+    for key in ("game_statistics", "special_hand_counts"):
+        for name, value in results[key].items():
+            total[key][name] = total[key].get(name, 0) + value
+    return total
+
+def game_seed(seed, index):
+    return f"{seed}:{index}"
+
+def play_headless_game(seed, strategies, max_rounds=4, planner_settings=None):
+    game = Mahjong(seed=seed, headless=True, planner_settings=planner_settings)
+    game.max_rounds = max_rounds
+    game.set_strategies(strategies)
+    game.play_game()
+    return game
+
+def run_shard(start, count, seed, strategies, max_rounds=4, planner_settings=None):
+    total = empty_results()
+    for index in range(start, start + count):
+        game = play_headless_game(game_seed(seed, index), strategies, max_rounds, planner_settings)
+        merge_results(total, game_results(game))
+    return total
+
+def shard_ranges(n_games, shards):
+    size, extra = divmod(n_games, shards)
+    start = 0
+    for shard in range(shards):
+        count = size + (1 if shard < extra else 0)
+        if count:
+            yield start, count
+        start += count
+
+def simulate(n_games, seed=0, strategies=DEFAULT_STRATEGIES, workers=None, max_rounds=4, planner_settings=None):
+    strategies = list(strategies)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        return run_shard(0, n_games, seed, strategies, max_rounds, planner_settings)
+    total = empty_results()
+    shards = list(shard_ranges(n_games, workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_shard, start, count, seed, strategies, max_rounds, planner_settings) for start, count in shards]
+        for future in futures:
+            merge_results(total, future.result())
+    return total
+
+def add_planner_arguments(parser):
+    parser.add_argument("--mc-time-budget", type=float, help="Seconds the monte_carlo strategy may spend per discard")
+    parser.add_argument("--mc-rollouts", type=int, help="Rollouts the monte_carlo strategy may run per discard")
+
+def planner_settings(args):
+    settings = {}
+    if args.mc_time_budget is not None:
+        settings["time_budget"] = args.mc_time_budget
+    if args.mc_rollouts is not None:
+        settings["rollout_budget"] = args.mc_rollouts
+    return settings or None
+
+def main():
+    parser = argparse.ArgumentParser(description="Run headless Mahjong games in parallel.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--strategies", nargs=4, default=DEFAULT_STRATEGIES)
+    add_planner_arguments(parser)
+    args = parser.parse_args()
+    results = simulate(args.games, args.seed, args.strategies, args.workers, args.rounds, planner_settings(args))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
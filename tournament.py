@@ -0,0 +1,189 @@
+import argparse
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+from simulation import add_planner_arguments, game_seed, planner_settings, play_headless_game
+
+METRICS = {
+    "points": lambda game, seat: game.points[seat],
+    "wins": lambda game, seat: game.round_wins[seat],
+}
+
+def seat_lineup(strategies):
+    return [strategies[seat % len(strategies)] for seat in range(4)]
+
+def distinct_rotations(lineup):
+    return list(dict.fromkeys(tuple(lineup[rotation:] + lineup[:rotation]) for rotation in range(4)))
+
+def play_board(seed, lineup, max_rounds=1, metric="points", planner_settings=None):
+    score = METRICS[metric]
+    totals = dict.fromkeys(lineup, 0.0)
+    seats = dict.fromkeys(lineup, 0)
+    for rotated in distinct_rotations(lineup):
+        rotated = list(rotated)
+        game = play_headless_game(seed, rotated, max_rounds, planner_settings)
+        for seat, name in enumerate(rotated):
+            totals[name] += score(game, seat)
+            seats[name] += 1
+    return {name: totals[name] / seats[name] for name in totals}
+
+def play_boards(start, count, seed, lineup, max_rounds, metric, planner_settings=None):
+    return [play_board(game_seed(seed, index), lineup, max_rounds, metric, planner_settings)
+            for index in range(start, start + count)]
+
+class RunningStats:
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def interval(self, z):
+        margin = z * math.sqrt(self.variance / self.count) if self.count else math.inf
+        return self.mean - margin, self.mean + margin
+
+class Tournament:
+    def __init__(self, strategies, confidence=0.95, batch_size=16, min_boards=32, max_boards=2000,
+                 max_rounds=1, metric="points", seed=0, workers=1, planner_settings=None):
+        if not 2 <= len(strategies) <= 4:
+            raise ValueError("A tournament needs between two and four strategies")
+        if len(set(strategies)) != len(strategies):
+            raise ValueError("Strategies must be distinct")
+        if metric == "points" and max_rounds > 1:
+            raise ValueError("The points metric only holds the last win's score; use one round or the wins metric")
+        self.strategies = list(strategies)
+        self.lineup = seat_lineup(self.strategies)
+        self.rotations = len(distinct_rotations(self.lineup))
+        self.confidence = confidence
+        self.batch_size = batch_size
+        self.min_boards = min_boards
+        self.max_boards = max_boards
+        self.max_rounds = max_rounds
+        self.metric = metric
+        self.seed = seed
+        self.workers = workers
+        self.planner_settings = planner_settings
+        self.pairs = list(itertools.combinations(self.strategies, 2))
+        looks = math.ceil(max_boards / batch_size)
+        alpha = (1 - confidence) / (looks * len(self.pairs))
+        self.z = NormalDist().inv_cdf(1 - alpha / 2)
+        self.scores = {name: RunningStats() for name in self.strategies}
+        self.differences = {pair: RunningStats() for pair in self.pairs}
+        self.boards = 0
+        self.games = 0
+
+    def record(self, board):
+        self.boards += 1
+        self.games += self.rotations
+        for name, value in board.items():
+            self.scores[name].add(value)
+        for first, second in self.pairs:
+            self.differences[first, second].add(board[first] - board[second])
+
+    def separated(self, pair):
+        low, high = self.differences[pair].interval(self.z)
+        return low > 0 or high < 0
+
+    def should_stop(self):
+        if self.boards >= self.max_boards:
+            return True
+        return self.boards >= self.min_boards and all(self.separated(pair) for pair in self.pairs)
+
+    def batches(self):
+        start = 0
+        while start < self.max_boards:
+            count = min(self.batch_size, self.max_boards - start)
+            yield start, count
+            start += count
+
+    def run(self):
+        if self.workers <= 1:
+            for start, count in self.batches():
+                for board in play_boards(start, count, self.seed, self.lineup, self.max_rounds, self.metric,
+                                         self.planner_settings):
+                    self.record(board)
+                if self.should_stop():
+                    break
+            return self.results()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            batches = self.batches()
+            pending = []
+            for start, count in itertools.islice(batches, self.workers):
+                pending.append(pool.submit(play_boards, start, count, self.seed, self.lineup, self.max_rounds,
+                                           self.metric, self.planner_settings))
+            while pending:
+                for board in pending.pop(0).result():
+                    self.record(board)
+                if self.should_stop():
+                    for future in pending:
+                        future.cancel()
+                    break
+                for start, count in itertools.islice(batches, 1):
+                    pending.append(pool.submit(play_boards, start, count, self.seed, self.lineup, self.max_rounds,
+                                           self.metric, self.planner_settings))
+        return self.results()
+
+    def results(self):
+        strategies = {}
+        for name, stats in self.scores.items():
+            low, high = stats.interval(self.z)
+            strategies[name] = {"mean": stats.mean, "ci_low": low, "ci_high": high}
+        pairings = {}
+        for first, second in self.pairs:
+            stats = self.differences[first, second]
+            low, high = stats.interval(self.z)
+            unpaired = self.scores[first].variance + self.scores[second].variance
+            pairings[f"{first} vs {second}"] = {
+                "mean_difference": stats.mean,
+                "ci_low": low,
+                "ci_high": high,
+                "separated": low > 0 or high < 0,
+                "variance_ratio": stats.variance / unpaired if unpaired else 0.0,
+            }
+        return {
+            "boards": self.boards,
+            "games": self.games,
+            "stopped_early": self.boards < self.max_boards,
+            "confidence": self.confidence,
+            "z": self.z,
+            "metric": self.metric,
+            "strategies": strategies,
+            "pairings": pairings,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare strategies on duplicate deals with early stopping.")
+    parser.add_argument("strategies", nargs="+", help="Two to four strategy names, e.g. default efficiency")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--batch", type=int, default=16, help="Boards played between significance checks")
+    parser.add_argument("--min-boards", type=int, default=32)
+    parser.add_argument("--max-boards", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=1, help="Rounds per game")
+    parser.add_argument("--metric", choices=sorted(METRICS), default="points")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    add_planner_arguments(parser)
+    args = parser.parse_args()
+    if args.metric == "points" and args.rounds > 1:
+        parser.error("--metric points needs --rounds 1; use --metric wins for longer games")
+    tournament = Tournament(args.strategies, args.confidence, args.batch, args.min_boards, args.max_boards,
+                            args.rounds, args.metric, args.seed, args.workers, planner_settings(args))
+    print(json.dumps(tournament.run(), indent=2))
+
+if __name__ == "__main__":
+    main()